@@ -1,67 +1,651 @@
 ﻿# coding=utf-8
 # 导入所需的标准库
+import csv  # csv输出
+import json  # jsonl输出
+from argparse import ArgumentParser  # 命令行参数解析
+from array import array  # 端口号列存储
+from collections import Counter, deque, namedtuple  # 差异统计、在途解析任务队列、端口记录
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed  # 并行解析与多文件调度
+from functools import partial  # 性能分析时包装处理函数
+from cProfile import Profile  # 可选的性能分析
+from pstats import Stats  # 合并各线程的性能分析结果
+from hashlib import sha256  # ZIP内容摘要
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer  # 本地任务服务
+from ipaddress import ip_address  # 判断服务请求是否来自本机
+from heapq import heappush, heappushpop  # 记录最慢的主机
 from math import floor  # 用于进度计算时向下取整
-from os import path, getcwd, listdir, system  # 文件和系统操作相关函数
+from multiprocessing import freeze_support  # 打包为exe后支持多进程
+from ctypes import CDLL, get_errno  # 调用libc的inotify
+from ctypes.util import find_library
+from os import path, getcwd, listdir, system, cpu_count, stat, strerror  # 文件和系统操作相关函数
+from os import read as readFd, close as closeFd  # 读取inotify事件
 from pathlib import Path  # 路径处理
-from re import match  # 正则表达式匹配
-from time import strftime, localtime  # 时间处理
-from zipfile import ZipFile  # ZIP文件处理
+from pickle import dumps, loads, HIGHEST_PROTOCOL  # 缓存记录序列化
+from queue import Queue, Full  # 服务任务队列
+from re import match, sub  # 正则表达式匹配
+from select import select  # 等待inotify事件
+from shutil import copyfileobj, rmtree  # 下载结果、删除任务目录
+from sqlite3 import connect  # 解析结果缓存
+from struct import unpack, unpack_from  # 解析ZIP本地文件头和BIFF记录
+from sys import intern, platform  # 字符串驻留、平台判断
+from threading import Event, Lock, Thread  # 批量进度的线程同步、服务任务线程
+from time import strftime, localtime, monotonic, perf_counter, sleep, time  # 时间处理
+from zipfile import ZipFile, BadZipFile, ZIP_STORED, ZIP_DEFLATED  # ZIP文件处理
+from urllib.parse import urlparse, parse_qs, quote  # 服务请求解析
+from uuid import uuid4  # 服务任务ID
+from zlib import decompressobj, crc32  # ZIP成员解压与校验
 
 # 导入第三方库
 from colorama import init, Fore  # 控制台颜色输出
 from openpyxl import Workbook  # Excel写入
 from xlrd import open_workbook  # Excel读取
+from xlrd.biffh import unpack_unicode  # 以下为快速解析复用的xlrd底层函数
+from xlrd.book import unpack_SST_table
+from xlrd.compdoc import CompDoc
+from xlrd.sheet import unpack_RK
+
+# 可选依赖：安装pyarrow后支持parquet输出
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = pq = None
+
+# 导入同目录下的模块
+from rsas_store import ScanStore, readOutputRows  # 跨任务的历史库、读取已生成的结果
 
 
 # initiate font color
 init(autoreset=True)
 
+# 主机数少于该值时直接在主进程中串行解析，避免进程池的启动和传输开销
+PARALLEL_MIN_HOSTS = 64
 
-def readZipData(path_, filename):
+
+class PortRange(namedtuple('PortRange', 'transport start end protocol service status')):
     """
-    从ZIP文件中读取RSAS扫描报告的XLS文件
+    单条端口记录（HostRecord.ports()产出的视图），端口范围（如1-65535）只保存一次起止端口
+    单个端口的start与end相同；无法识别为数字的端口值原样保存在start/end中
+    """
+    __slots__ = ()
+
+    def ports(self):
+        """
+        展开为逐个端口
+        """
+        if self.start == self.end:
+            return (self.start,)
+        return range(self.start, self.end + 1)
+
+    def label(self):
+        """
+        折叠输出时的端口列，范围显示为“起始-结束”
+        """
+        if self.start == self.end:
+            return self.start
+        return f'{self.start}-{self.end}'
+
+
+def internValue(value):
+    """
+    驻留字符串，操作系统等重复值在所有主机记录中共用同一个对象
+    """
+    return intern(value) if type(value) is str else value
+
+
+# 端口属性组合（传输层协议, 应用层协议, 服务, 状态）的驻留表，同一组合在所有端口记录中共用一个元组
+_port_labels = {}
+PORT_LABELS_MAX = 1 << 16
+
+
+def internLabel(label):
+    """
+    驻留端口属性组合，驻留表达到上限后不再增长
+    """
+    shared = _port_labels.get(label)
+    if shared is not None:
+        return shared
+    if len(_port_labels) < PORT_LABELS_MAX:
+        _port_labels[label] = label
+    return label
+
+
+class HostRecord:
+    """
+    单个主机的解析结果
+    主机信息保存为属性；端口信息按列保存：起止端口为两个整数数组，
+    协议/服务/状态组合为驻留元组列表，无法识别为数字的端口值单独保存在raw_ports中（键为端口记录序号）
+    """
+    __slots__ = ('ip', 'hostname', 'system_type', 'scan_time', 'starts', 'ends', 'labels', 'raw_ports')
+
+    def __init__(self, ip, hostname, system_type, scan_time):
+        self.ip = ip
+        self.hostname = hostname
+        self.system_type = system_type
+        self.scan_time = scan_time
+        self.starts = array('i')
+        self.ends = array('i')
+        self.labels = []
+        self.raw_ports = None
+
+    def addPort(self, transport, start, end, protocol, service, status):
+        """
+        追加一条端口记录（单个端口的start与end相同）
+        """
+        try:
+            self.starts.append(start)
+            self.ends.append(end)
+        except (TypeError, OverflowError):
+            # 非数字或超出范围的端口值原样保存
+            del self.starts[len(self.ends):]
+            if self.raw_ports is None:
+                self.raw_ports = {}
+            self.raw_ports[len(self.ends)] = start
+            self.starts.append(0)
+            self.ends.append(0)
+        self.labels.append(internLabel((transport, protocol, service, status)))
+
+    def __getstate__(self):
+        return None, {name: getattr(self, name) for name in self.__slots__}
+
+    def __setstate__(self, state):
+        """
+        反序列化（进程池返回的结果、缓存中的记录）时重新驻留，驻留表只在本进程内有效
+        """
+        for name, value in state[1].items():
+            setattr(self, name, value)
+        self.system_type = internValue(self.system_type)
+        self.labels = [internLabel(label) for label in self.labels]
+
+    def __len__(self):
+        return len(self.starts)
+
+    def __eq__(self, other):
+        if not isinstance(other, HostRecord):
+            return NotImplemented
+        return all(getattr(self, name) == getattr(other, name) for name in self.__slots__)
+
+    def __repr__(self):
+        return f'HostRecord(ip={self.ip!r}, hostname={self.hostname!r}, ports={len(self)})'
+
+    def ports(self):
+        """
+        逐条产出端口记录
+        Yields:
+            PortRange: 端口记录
+        """
+        raw_ports = self.raw_ports or {}
+        for index, (start, end, (transport, protocol, service, status)) in enumerate(zip(self.starts, self.ends,
+                                                                                         self.labels)):
+            if index in raw_ports:
+                start = end = raw_ports[index]
+            yield PortRange(transport, start, end, protocol, service, status)
+
+    def rowCount(self, collapse=False):
+        """
+        不展开端口范围，直接计算rows()产出的行数
+        """
+        if not self.starts:
+            return 1
+        if collapse:
+            return len(self.starts)
+        # raw_ports对应的起止端口均为0，恰好计为一行
+        return sum(self.ends) - sum(self.starts) + len(self.starts)
+
+    def rows(self, taskid, collapse=False):
+        """
+        展开为输出行
+        Args:
+            taskid: 任务ID
+            collapse: 为True时端口范围只输出一行（端口列为“起始-结束”），否则逐个端口展开
+        Yields:
+            list: 与HEADER对应的一行数据，没有端口信息的主机输出一行null
+        """
+        ip = self.ip
+        host = [taskid, ip, self.hostname, self.system_type, self.scan_time]
+        if not self.starts:
+            # 端口相关字段填充null
+            yield host + ['null'] * 5
+            return
+        raw_ports = self.raw_ports or {}
+        for index, (start, end, (transport, protocol, service, status)) in enumerate(zip(self.starts, self.ends,
+                                                                                         self.labels)):
+            if index in raw_ports:
+                ports = (raw_ports[index],)
+            elif start == end:
+                ports = (start,)
+            elif collapse:
+                ports = (f'{start}-{end}',)
+            else:
+                ports = range(start, end + 1)
+            for port in ports:
+                yield host + [port, protocol, service, status, f'{ip}:{port}']
+
+
+def listHostMembers(zip_path):
+    """
+    从ZIP中央目录中列出所有主机xls成员
     Args:
-        path_: ZIP文件所在路径
-        filename: ZIP文件名
+        zip_path: ZIP文件路径
     Returns:
-        dic_list: 包含所有主机信息和端口信息的字典列表
+        list: 按namelist()顺序排列的成员信息元组
+              (文件名, 本地文件头偏移, 压缩方式, 压缩后大小, 原始大小, CRC32, 标志位)
     """
-    dic_list = []
-    with ZipFile(Path(f'{path_}/{filename}'), 'r') as f:
-        for name in f.namelist():
+    members = []
+    with ZipFile(zip_path, 'r') as f:
+        for info in f.infolist():
             # 匹配形如 x.x.x.x.xls 的文件名（IP地址格式）
-            if match(r'(\d+\.){4}xls', name):
-                with f.open(name, mode='r') as data:
-                    content = open_workbook(file_contents=data.read())
-                    dic_list.append(readPortXlsData(data=content))
-    return dic_list
+            if match(r'(\d+\.){4}xls', info.filename):
+                members.append((info.filename, info.header_offset, info.compress_type,
+                                info.compress_size, info.file_size, info.CRC, info.flag_bits))
+    return members
 
 
-#   read data from xls, xlrd column and row begin at 0
-def readPortXlsData(filename='', data=''):
+def readMemberBytes(fp, zip_path, member):
     """
-    读取并解析RSAS扫描报告中的端口信息
+    按中央目录记录的偏移直接读取并解压单个ZIP成员，无需在每个进程中重新解析中央目录
     Args:
-        filename: 文件名（可选）
-        data: 已打开的workbook对象（可选）
+        fp: 以二进制方式打开的ZIP文件对象
+        zip_path: ZIP文件路径（遇到不支持的压缩方式时回退到ZipFile读取）
+        member: listHostMembers()返回的成员信息元组
     Returns:
-        dic: 包含主机信息和端口信息的字典
+        bytes: 解压后的文件内容
     """
-    # 如果提供了文件名，则打开文件
-    if filename:
-        data = open_workbook(filename)
+    name, offset, compress_type, compress_size, file_size, crc, flag_bits = member
+    # 加密成员或非常见压缩方式交给zipfile处理
+    if flag_bits & 0x1 or compress_type not in (ZIP_STORED, ZIP_DEFLATED):
+        with ZipFile(zip_path, 'r') as f:
+            return f.read(name)
+    fp.seek(offset)
+    header = fp.read(30)
+    if header[:4] != b'PK\x03\x04':
+        raise BadZipFile(f'成员[{name}]的本地文件头无效')
+    name_len, extra_len = unpack('<HH', header[26:30])
+    fp.seek(offset + 30 + name_len + extra_len)
+    raw = fp.read(compress_size)
+    content = raw if compress_type == ZIP_STORED else decompressobj(-15).decompress(raw)
+    if len(content) != file_size or crc32(content) != crc:
+        raise BadZipFile(f'成员[{name}]校验失败')
+    return content
+
+
+def parseMembers(zip_path, members, fast=True):
+    """
+    解析一批主机xls成员，可在子进程中执行
+    Args:
+        zip_path: ZIP文件路径
+        members: listHostMembers()返回的成员信息元组列表
+        fast: 是否优先使用快速解析
+    Returns:
+        list: 按传入顺序排列的主机记录
+    """
+    results = []
+    with open(zip_path, 'rb') as fp:
+        for member in members:
+            results.append(parseHostXls(readMemberBytes(fp, zip_path, member), fast))
+    return results
+
+
+def parseMemberTimed(fp, zip_path, member, fast=True):
+    """
+    解析单个主机xls成员，同时记录解压、解析耗时
+    Returns:
+        tuple: (主机记录, (解压耗时, 解析耗时, 是否回退到xlrd, 跳过的端口行数))
+    """
+    started = perf_counter()
+    contents = readMemberBytes(fp, zip_path, member)
+    inflated = perf_counter()
+    stats = {'fallback': False, 'skipped_rows': 0}
+    record = parseHostXls(contents, fast, stats)
+    return record, (inflated - started, perf_counter() - inflated, stats['fallback'], stats['skipped_rows'])
+
+
+def parseMembersTimed(zip_path, members, fast=True):
+    """
+    与parseMembers()相同，但同时返回每个主机的耗时，可在子进程中执行
+    Returns:
+        list: parseMemberTimed()结果的列表
+    """
+    with open(zip_path, 'rb') as fp:
+        return [parseMemberTimed(fp, zip_path, member, fast) for member in members]
+
+
+def hostCacheKey(member):
+    """
+    生成主机成员的缓存键，由成员名、中央目录中的CRC32和原始大小组成
+    """
+    name, offset, compress_type, compress_size, file_size, crc, flag_bits = member
+    return f'{name}:{crc:08x}:{file_size}'
+
+
+def fileDigest(file_path):
+    """
+    计算文件内容的SHA-256摘要
+    """
+    digest = sha256()
+    with open(file_path, 'rb') as fp:
+        for block in iter(lambda: fp.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+# persistent parse cache
+class ResultCache:
+    """
+    持久化的解析结果缓存（SQLite），可在多个线程中共用
+    ZIP级别按文件大小、修改时间和SHA-256判断是否变化，未变化且输出文件仍在时整个跳过；
+    主机级别按成员CRC32缓存解析结果，重新导出的任务只解析发生变化的主机。
+    超出容量上限时按最近使用时间淘汰主机记录。
+    """
+    VERSION = '3'  # 主机记录结构变化时递增，旧缓存自动清空
+
+    def __init__(self, cache_dir, max_bytes=1024 << 20):
+        Path(cache_dir).mkdir(parents=True, exist_ok=True)
+        self.max_bytes = max_bytes
+        self.lock = Lock()
+        self.touched = []  # 待批量更新使用时间的主机键
+        self.conn = connect(str(Path(cache_dir) / 'cache.db'), check_same_thread=False)
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        self.conn.execute('PRAGMA synchronous=NORMAL')
+        self.conn.execute('CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)')
+        row = self.conn.execute("SELECT value FROM meta WHERE key = 'version'").fetchone()
+        if row is not None and row[0] != self.VERSION:
+            # 版本不一致时表结构可能也不同，直接重建
+            self.conn.executescript('DROP TABLE IF EXISTS hosts; DROP TABLE IF EXISTS archives;')
+        self.conn.executescript('''
+            CREATE TABLE IF NOT EXISTS hosts (key TEXT PRIMARY KEY, data BLOB, size INTEGER, used REAL);
+            CREATE INDEX IF NOT EXISTS hosts_used ON hosts (used);
+            CREATE TABLE IF NOT EXISTS archives (file TEXT PRIMARY KEY, size INTEGER, mtime REAL,
+                                                 digest TEXT, output TEXT, output_mtime REAL, options TEXT);
+        ''')
+        if row is None or row[0] != self.VERSION:
+            self.clear()
+
+    def clear(self):
+        """
+        清空所有缓存
+        """
+        with self.lock:
+            self.conn.execute('DELETE FROM hosts')
+            self.conn.execute('DELETE FROM archives')
+            self.conn.execute("INSERT OR REPLACE INTO meta VALUES ('version', ?)", (self.VERSION,))
+            self.conn.commit()
+            self.conn.execute('VACUUM')
+
+    def contains(self, keys):
+        """
+        返回keys中已缓存的主机键集合
+        """
+        found = set()
+        with self.lock:
+            for i in range(0, len(keys), 500):
+                batch = keys[i:i + 500]
+                rows = self.conn.execute(f'SELECT key FROM hosts WHERE key IN ({",".join("?" * len(batch))})', batch)
+                found.update(row[0] for row in rows)
+        return found
+
+    def get(self, key):
+        """
+        读取单个主机的解析结果，不存在时返回None
+        """
+        with self.lock:
+            row = self.conn.execute('SELECT data FROM hosts WHERE key = ?', (key,)).fetchone()
+            if row is None:
+                return None
+            self.touched.append(key)
+        return loads(row[0])
+
+    def put(self, items):
+        """
+        批量写入主机解析结果
+        Args:
+            items: (缓存键, 主机记录)列表
+        """
+        now = time()
+        rows = []
+        for key, record in items:
+            data = dumps(record, protocol=HIGHEST_PROTOCOL)
+            rows.append((key, data, len(data), now))
+        with self.lock:
+            self.conn.executemany('INSERT OR REPLACE INTO hosts VALUES (?, ?, ?, ?)', rows)
+            self.conn.executemany('UPDATE hosts SET used = ? WHERE key = ?', [(now, key) for key in self.touched])
+            self.touched = []
+            self.conn.commit()
+
+    def evict(self):
+        """
+        主机记录总大小超过上限时，按最近使用时间从旧到新淘汰
+        """
+        with self.lock:
+            total = self.conn.execute('SELECT COALESCE(SUM(size), 0) FROM hosts').fetchone()[0]
+            if total <= self.max_bytes:
+                return
+            excess = total - self.max_bytes
+            doomed = []
+            for key, size in self.conn.execute('SELECT key, size FROM hosts ORDER BY used'):
+                doomed.append((key,))
+                excess -= size
+                if excess <= 0:
+                    break
+            self.conn.executemany('DELETE FROM hosts WHERE key = ?', doomed)
+            self.conn.commit()
+
+    def archiveUnchanged(self, zip_path, output, options=''):
+        """
+        判断ZIP自上次处理后是否未发生变化且输出文件仍然有效
+        大小和修改时间一致时直接认定未变化，否则再比较SHA-256（例如文件被重新复制）
+        Args:
+            zip_path: ZIP文件路径
+            output: 本次的输出文件路径
+            options: 影响输出内容的选项，与上次不同时需要重新输出
+        """
+        with self.lock:
+            row = self.conn.execute('SELECT size, mtime, digest, output, output_mtime, options FROM archives '
+                                    'WHERE file = ?', (str(zip_path),)).fetchone()
+        if row is None:
+            return False
+        size, mtime, digest, old_output, output_mtime, old_options = row
+        if old_output != str(output) or old_options != options:
+            return False
+        if not path.exists(output) or stat(output).st_mtime != output_mtime:
+            return False
+        info = stat(zip_path)
+        if info.st_size != size:
+            return False
+        if info.st_mtime == mtime:
+            return True
+        if fileDigest(zip_path) != digest:
+            return False
+        # 内容未变，只是修改时间变了，更新记录避免下次重复计算摘要
+        with self.lock:
+            self.conn.execute('UPDATE archives SET mtime = ? WHERE file = ?', (info.st_mtime, str(zip_path)))
+            self.conn.commit()
+        return True
+
+    def recordArchive(self, zip_path, output, options=''):
+        """
+        记录ZIP处理完成后的状态
+        """
+        info = stat(zip_path)
+        row = (str(zip_path), info.st_size, info.st_mtime, fileDigest(zip_path), str(output), stat(output).st_mtime,
+               options)
+        with self.lock:
+            self.conn.execute('INSERT OR REPLACE INTO archives VALUES (?, ?, ?, ?, ?, ?, ?)', row)
+            self.conn.commit()
+
+    def close(self):
+        with self.lock:
+            self.conn.close()
+
+
+def resolveWorkers(workers):
+    """
+    计算实际使用的解析进程数
+    Args:
+        workers: 用户指定的进程数，0表示按CPU核数自动选择
+    Returns:
+        int: 进程数（至少为1）
+    """
+    if workers <= 0:
+        workers = cpu_count() or 1
+    return max(1, workers)
+
+
+def parseStream(zip_path, members, workers=1, pool=None, fast=True, metrics=None):
+    """
+    按顺序逐个产出指定成员的解析结果
+    Args:
+        zip_path: ZIP文件路径
+        members: 需要解析的成员信息元组列表
+        workers: 并行解析的进程数，1为串行解析
+        pool: 可复用的ProcessPoolExecutor（进程数应与workers一致），不提供时按需临时创建
+        fast: 是否优先使用快速解析
+        metrics: PipelineMetrics，提供时记录每个主机的解压、解析耗时
+    Yields:
+        HostRecord: 主机记录，顺序与members一致
+    """
+    if metrics is not None:
+        yield from parseStreamTimed(zip_path, members, workers, pool, fast, metrics)
+        return
+    if workers <= 1 or len(members) < PARALLEL_MIN_HOSTS:
+        with open(zip_path, 'rb') as fp:
+            for member in members:
+                yield parseHostXls(readMemberBytes(fp, zip_path, member), fast)
+        return
     
-    # 获取两个关键sheet页
-    host_data = data.sheet_by_name('主机概况')  # 包含主机基本信息的sheet
-    port_data = data.sheet_by_name('其它信息')  # 包含端口信息的sheet
-    row_count = port_data.nrows  # 获取行数
+    # 按批次分发成员，每个进程约分到4批以平衡负载
+    size = max(1, min(64, len(members) // (workers * 4)))
+    chunks = [members[i:i + size] for i in range(0, len(members), size)]
+    local_pool = None
+    if pool is None:
+        pool = local_pool = ProcessPoolExecutor(max_workers=workers)
+    try:
+        # 只保留有限个在途批次，写入端较慢时不会在内存中堆积解析结果；按提交顺序取回保证输出顺序
+        pending = deque()
+        for chunk in chunks:
+            pending.append(pool.submit(parseMembers, zip_path, chunk, fast))
+            if len(pending) >= workers * 2:
+                yield from pending.popleft().result()
+        while pending:
+            yield from pending.popleft().result()
+    finally:
+        if local_pool is not None:
+            local_pool.shutdown(cancel_futures=True)
+
+
+def parseStreamTimed(zip_path, members, workers, pool, fast, metrics):
+    """
+    parseStream()开启计时时的实现，耗时在解析所在的进程中测量，随结果一起取回
+    """
+    archive = path.basename(zip_path)
+    if workers <= 1 or len(members) < PARALLEL_MIN_HOSTS:
+        with open(zip_path, 'rb') as fp:
+            for member in members:
+                record, timing = parseMemberTimed(fp, zip_path, member, fast)
+                metrics.addParse(archive, member[0], timing)
+                yield record
+        return
     
-    # 初始化数据存储结构
-    dic = {}  # 用于存储所有提取的信息
-    port_info_list = []  # 用于存储端口信息的列表
+    size = max(1, min(64, len(members) // (workers * 4)))
+    chunks = [members[i:i + size] for i in range(0, len(members), size)]
+    local_pool = None
+    if pool is None:
+        pool = local_pool = ProcessPoolExecutor(max_workers=workers)
+    try:
+        pending = deque()
+        for index, chunk in enumerate(chunks):
+            pending.append((chunk, pool.submit(parseMembersTimed, zip_path, chunk, fast)))
+            # 与parseStream()相同，只保留有限个在途批次，最后一批提交后取回全部
+            while pending and (len(pending) >= workers * 2 or index == len(chunks) - 1):
+                chunk, future = pending.popleft()
+                for member, (record, timing) in zip(chunk, future.result()):
+                    metrics.addParse(archive, member[0], timing)
+                    yield record
+    finally:
+        if local_pool is not None:
+            local_pool.shutdown(cancel_futures=True)
+
+
+def iterZipData(path_, filename, workers=1, pool=None, members=None, cache=None, reporter=None, fast=True,
+                metrics=None):
+    """
+    逐个产出ZIP中每个主机的解析结果，供save()边读边写
+    Args:
+        path_: ZIP文件所在路径
+        filename: ZIP文件名
+        workers: 并行解析的进程数，1为串行解析
+        pool: 可复用的ProcessPoolExecutor（进程数应与workers一致），不提供时按需临时创建
+        members: 已列出的主机成员（listHostMembers()的结果），省略时自动读取
+        cache: ResultCache，提供时只解析CRC32发生变化的主机
+        reporter: 批量处理时的BatchProgress，用于输出缓存命中情况
+        fast: 是否优先使用快速解析，布局不符合预期的文件自动回退到xlrd完整解析
+        metrics: PipelineMetrics，提供时记录各阶段耗时和缓存命中情况
+    Yields:
+        HostRecord: 主机记录，顺序与f.namelist()一致
+    """
+    zip_path = str(Path(f'{path_}/{filename}'))
+    if members is None:
+        members = listHostMembers(zip_path)
+    if cache is None:
+        yield from parseStream(zip_path, members, workers, pool, fast, metrics)
+        return
     
-    # 提取主机基本信息
-    dic[0] = host_data.cell(2, 1).value  # 主机IP地址
+    # 先只查询哪些主机已缓存，未命中的交给进程池解析，命中的按顺序逐个从缓存取出
+    started = perf_counter()
+    keys = [hostCacheKey(member) for member in members]
+    cached = cache.contains(keys)
+    misses = [member for member, key in zip(members, keys) if key not in cached]
+    if metrics is not None:
+        metrics.addStage('cache', perf_counter() - started)
+        metrics.count('cache_hits', len(members) - len(misses))
+        metrics.count('cache_misses', len(misses))
+    echo = print if reporter is None else reporter.log
+    echo(f'\t{Fore.GREEN}[+]{current_time()}\t文件[{filename}]缓存命中 {len(members) - len(misses)} 台主机，'
+         f'需解析 {len(misses)} 台。')
+    parsed = parseStream(zip_path, misses, workers, pool, fast, metrics)
+    fresh = []
+    for member, key in zip(members, keys):
+        record = None
+        if key in cached:
+            started = perf_counter()
+            record = cache.get(key)
+            if metrics is not None:
+                metrics.addStage('cache', perf_counter() - started)
+        if record is None:
+            # 未命中，或查询后被其他线程淘汰
+            record = next(parsed) if key not in cached else parseMembers(zip_path, [member], fast)[0]
+            fresh.append((key, record))
+            if len(fresh) >= 256:
+                cache.put(fresh)
+                fresh = []
+        yield record
+    cache.put(fresh)
+
+
+def readZipData(path_, filename, workers=1, pool=None, fast=True):
+    """
+    从ZIP文件中读取RSAS扫描报告的XLS文件
+    Args:
+        path_: ZIP文件所在路径
+        filename: ZIP文件名
+        workers: 并行解析的进程数，1为串行解析
+        pool: 可复用的ProcessPoolExecutor（进程数应与workers一致），不提供时按需临时创建
+        fast: 是否优先使用快速解析
+    Returns:
+        list: 包含所有主机信息和端口信息的主机记录列表，顺序与f.namelist()一致
+    """
+    return list(iterZipData(path_, filename, workers=workers, pool=pool, fast=fast))
+
+
+def readHostInfo(cell):
+    """
+    从“主机概况”页提取主机基本信息
+    Args:
+        cell: 取单元格值的函数 cell(行, 列)，行列从0开始
+    Returns:
+        HostRecord: 尚未填入端口信息的主机记录
+    """
+    ip = cell(2, 1)  # 主机IP地址
     
     # 初始化主机名和操作系统列索引
     numbers = [1, 2, 3, 4]
@@ -70,28 +654,93 @@ def readPortXlsData(filename='', data=''):
     
     # 查找主机名和操作系统所在列
     for i in numbers:
-        if host_data.cell(4, i).value == u'主机名':
+        if cell(4, i) == u'主机名':
             h = i
-        elif host_data.cell(4, i).value == u'操作系统':
+        elif cell(4, i) == u'操作系统':
             s = i
     
     # 提取主机名，如果未找到则置空
     if h == 0:
-        dic[1] = ' '
+        hostname = ' '
     else:
-        dic[1] = host_data.cell(5, h).value  # 主机名
+        hostname = cell(5, h)  # 主机名
     
     # 提取操作系统信息，如果未找到则置空
     if s == 0:
-        dic[2] = ' '
+        system_type = ' '
     else:
-        dic[2] = host_data.cell(5, s).value  # 操作系统
+        system_type = internValue(cell(5, s))  # 操作系统
     
     # 提取扫描时间
-    dic[3] = host_data.cell(8, 2).value  # 扫描完成时间
+    scan_time = cell(8, 2)  # 扫描完成时间
     # 如果扫描时间格式不正确，使用开始时间
-    if not match('\d{4}-\d{2}-\d{2} \d{2}:\d{2}:\d{2}', dic[3]):
-        dic[3] = host_data.cell(8, 1).value  # 使用扫描开始时间
+    if not match(r'\d{4}-\d{2}-\d{2} \d{2}:\d{2}:\d{2}', scan_time):
+        scan_time = cell(8, 1)  # 使用扫描开始时间
+    return HostRecord(ip, hostname, system_type, scan_time)
+
+
+def parsePortRow(row_data):
+    """
+    解析“远程端口信息”中的一行
+    Args:
+        row_data: 该行的单元格值列表
+    Returns:
+        tuple: (传输层协议, 起始端口, 结束端口, 应用层协议, 服务名称, 端口状态)，无效的端口行返回None
+    Raises:
+        ValueError, TypeError: 端口值无法解析
+    """
+    port_value = str(row_data[1]).strip()
+    # 处理端口范围情况（例如：80-89）
+    if '-' in port_value:
+        # 解析起始端口和结束端口，只保存一条范围记录，输出时再按需展开
+        start_port, end_port = map(int, port_value.split('-'))
+        if start_port <= end_port:
+            return (
+                row_data[0],  # 传输层协议（TCP/UDP）
+                start_port,  # 起始端口
+                end_port,  # 结束端口
+                row_data[2],  # 应用层协议
+                row_data[3],  # 服务名称
+                row_data[4] if len(row_data) > 4 else 'unknown'  # 端口状态，如果没有则标记为unknown
+            )
+    else:
+        # 处理单个端口
+        if port_value and (isinstance(row_data[1], (int, float)) or 
+            (isinstance(port_value, str) and port_value.strip())):
+            port = int(float(port_value)) if port_value.replace('.', '').isdigit() else port_value  # 端口号
+            return (
+                row_data[0],  # 传输层协议（TCP/UDP）
+                port,  # 起始端口与结束端口相同
+                port,
+                row_data[2],  # 应用层协议
+                row_data[3],  # 服务名称
+                row_data[4] if len(row_data) > 4 else 'unknown'  # 端口状态
+            )
+    return None
+
+
+#   read data from xls, xlrd column and row begin at 0
+def readPortXlsData(filename='', data='', stats=None):
+    """
+    读取并解析RSAS扫描报告中的端口信息
+    Args:
+        filename: 文件名（可选）
+        data: 已打开的workbook对象（可选）
+        stats: 统计字典（可选），提供时在其中累加跳过的端口行数skipped_rows
+    Returns:
+        HostRecord: 包含主机信息和端口信息的主机记录
+    """
+    # 如果提供了文件名，则打开文件
+    if filename:
+        data = open_workbook(filename)
+    
+    # 获取两个关键sheet页
+    host_data = data.sheet_by_name('主机概况')  # 包含主机基本信息的sheet
+    port_data = data.sheet_by_name('其它信息')  # 包含端口信息的sheet
+    row_count = port_data.nrows  # 获取行数
+    
+    # 提取主机基本信息
+    record = readHostInfo(lambda row, col: host_data.cell(row, col).value)
     
     # 端口信息处理部分
     port_start_row = -1  # 端口信息起始行
@@ -105,10 +754,9 @@ def readPortXlsData(filename='', data=''):
                 port_info_found = True
                 break
         
-        # 如果没有找到端口信息，返回空的端口列表
+        # 如果没有找到端口信息，返回没有端口的主机记录
         if not port_info_found:
-            dic[4] = port_info_list
-            return dic
+            return record
             
         # 处理端口信息
         if port_start_row > 0:
@@ -120,125 +768,503 @@ def readPortXlsData(filename='', data=''):
                 
                 # 处理端口信息
                 try:
-                    port_value = str(row_data[1]).strip()
-                    # 处理端口范围情况（例如：80-89）
-                    if '-' in port_value:
-                        # 解析起始端口和结束端口
-                        start_port, end_port = map(int, port_value.split('-'))
-                        # 遍历端口范围，为每个端口创建记录
-                        for port in range(start_port, end_port + 1):
-                            port_info = [
-                                row_data[0],  # 传输层协议（TCP/UDP）
-                                port,  # 端口号
-                                row_data[2],  # 应用层协议
-                                row_data[3],  # 服务名称
-                                row_data[4] if len(row_data) > 4 else 'unknown'  # 端口状态，如果没有则标记为unknown
-                            ]
-                            port_info_list.append(port_info)
-                    else:
-                        # 处理单个端口
-                        if port_value and (isinstance(row_data[1], (int, float)) or 
-                            (isinstance(port_value, str) and port_value.strip())):
-                            port_info = [
-                                row_data[0],  # 传输层协议（TCP/UDP）
-                                int(float(port_value)) if port_value.replace('.', '').isdigit() else port_value,  # 端口号
-                                row_data[2],  # 应用层协议
-                                row_data[3],  # 服务名称
-                                row_data[4] if len(row_data) > 4 else 'unknown'  # 端口状态
-                            ]
-                            port_info_list.append(port_info)
+                    port_info = parsePortRow(row_data)
+                    if port_info is not None:
+                        record.addPort(*port_info)
+                    elif stats is not None:
+                        stats['skipped_rows'] += 1
                 except (ValueError, TypeError) as e:
+                    if stats is not None:
+                        stats['skipped_rows'] += 1
                     continue  # 跳过无效的端口数据
                     
     except Exception as e:
         # 处理异常情况，打印错误信息并返回已收集的数据
         print(f'\t{Fore.RED}[-]{current_time()}\t处理端口信息时发生错误：{str(e)}')
-        dic[4] = port_info_list
         
-    # 存储端口信息列表并返回
-    dic[4] = port_info_list
-    return dic
+    return record
+
+
+# BIFF8记录类型
+BIFF_BOF = 0x0809
+BIFF_EOF = 0x000A
+BIFF_FILEPASS = 0x002F
+BIFF_BOUNDSHEET = 0x0085
+BIFF_SST = 0x00FC
+BIFF_CONTINUE = 0x003C
+BIFF_LABELSST = 0x00FD
+BIFF_LABEL = 0x0204
+BIFF_NUMBER = 0x0203
+BIFF_RK = 0x027E
+BIFF_MULRK = 0x00BD
+# 快速解析不处理的单元格记录：公式、布尔/错误值、富文本
+BIFF_UNSUPPORTED_CELLS = {0x0006, 0x0206, 0x0406, 0x0205, 0x00D6}
+
+
+class FastParseError(Exception):
+    """
+    快速解析遇到预期之外的文件布局，需要回退到xlrd完整解析
+    """
+
+
+def readBiffGlobals(contents):
+    """
+    读取BIFF8工作簿的全局信息：各工作表的位置和共享字符串表
+    格式、字体等其余记录全部跳过
+    Args:
+        contents: xls文件内容
+    Returns:
+        tuple: (工作簿流, 流结束位置, {工作表名: BOF位置}, 共享字符串列表)
+    """
+    if contents[:8] != b'\xd0\xcf\x11\xe0\xa1\xb1\x1a\xe1':
+        raise FastParseError('不是OLE2复合文档')
+    mem, base, size = CompDoc(contents, logfile=None).locate_named_stream('Workbook')
+    if mem is None:
+        raise FastParseError('没有BIFF8工作簿流')
+    end = base + size
+    code, length = unpack_from('<HH', mem, base)
+    if code != BIFF_BOF or unpack_from('<HH', mem, base + 4) != (0x0600, 0x0005):
+        raise FastParseError('不是BIFF8工作簿')
+    
+    sheets = {}
+    sst = None
+    last = None
+    pos = base + 4 + length
+    while pos + 4 <= end:
+        code, length = unpack_from('<HH', mem, pos)
+        data_pos = pos + 4
+        pos = data_pos + length
+        if code == BIFF_BOUNDSHEET:
+            offset, visibility, sheet_type, cch, flags = unpack_from('<IBBBB', mem, data_pos)
+            if flags & 0x01:
+                name = mem[data_pos + 8:data_pos + 8 + cch * 2].decode('utf_16_le')
+            else:
+                name = mem[data_pos + 8:data_pos + 8 + cch].decode('latin_1')
+            if sheet_type == 0:
+                sheets[name] = base + offset
+        elif code == BIFF_SST:
+            sst = [mem[data_pos:pos]]
+        elif code == BIFF_CONTINUE and last == BIFF_SST:
+            sst.append(mem[data_pos:pos])
+            continue
+        elif code == BIFF_FILEPASS:
+            raise FastParseError('工作簿已加密')
+        elif code == BIFF_EOF:
+            break
+        last = code
+    strings = unpack_SST_table(sst, unpack_from('<i', sst[0], 4)[0])[0] if sst else []
+    return mem, end, sheets, strings
+
+
+def iterBiffCells(mem, pos, end, strings):
+    """
+    逐个产出工作表中的有值单元格，取值与xlrd一致（文本为str，数字为float，空白单元格不产出）
+    Args:
+        mem: 工作簿流
+        pos: 工作表BOF记录的位置
+        end: 工作簿流结束位置
+        strings: 共享字符串列表
+    Yields:
+        tuple: (行, 列, 值)
+    """
+    code, length = unpack_from('<HH', mem, pos)
+    if code != BIFF_BOF:
+        raise FastParseError('工作表位置无效')
+    pos += 4 + length
+    while pos + 4 <= end:
+        code, length = unpack_from('<HH', mem, pos)
+        data_pos = pos + 4
+        pos = data_pos + length
+        if code == BIFF_LABELSST:
+            row, col, xf, index = unpack_from('<HHHi', mem, data_pos)
+            yield row, col, strings[index]
+        elif code == BIFF_NUMBER:
+            row, col, xf, value = unpack_from('<HHHd', mem, data_pos)
+            yield row, col, value
+        elif code == BIFF_RK:
+            row, col = unpack_from('<HH', mem, data_pos)
+            yield row, col, unpack_RK(mem[data_pos + 6:data_pos + 10])
+        elif code == BIFF_MULRK:
+            row, first = unpack_from('<HH', mem, data_pos)
+            last, = unpack_from('<H', mem, pos - 2)
+            rk_pos = data_pos + 4
+            for col in range(first, last + 1):
+                yield row, col, unpack_RK(mem[rk_pos + 2:rk_pos + 6])
+                rk_pos += 6
+        elif code == BIFF_LABEL:
+            row, col = unpack_from('<HH', mem, data_pos)
+            yield row, col, unpack_unicode(mem[data_pos:pos], 6, lenlen=2)
+        elif code in BIFF_UNSUPPORTED_CELLS or code == BIFF_BOF:
+            raise FastParseError(f'不支持的记录类型0x{code:04X}')
+        elif code == BIFF_EOF:
+            return
+    raise FastParseError('工作表缺少EOF记录')
+
+
+def readPortXlsFast(contents, stats=None):
+    """
+    快速解析RSAS主机报表：只按需读取“主机概况”和“其它信息”两页，
+    “其它信息”读到“远程端口信息”块结束即停止，结果与readPortXlsData()一致
+    Args:
+        contents: xls文件内容
+        stats: 统计字典（可选），提供时在其中累加跳过的端口行数skipped_rows
+    Returns:
+        HostRecord: 包含主机信息和端口信息的主机记录
+    Raises:
+        FastParseError: 文件布局不符合预期，应回退到readPortXlsData()
+    """
+    mem, end, sheets, strings = readBiffGlobals(contents)
+    if '主机概况' not in sheets or '其它信息' not in sheets:
+        raise FastParseError('缺少主机概况或其它信息页')
+    
+    # 主机概况：只需要第0-8行；单元格按行递增排列，读到第8行之后且已知列数足够时停止
+    cells = {}
+    nrows = ncols = 0
+    for row, col, value in iterBiffCells(mem, sheets['主机概况'], end, strings):
+        if row < nrows - 1:
+            raise FastParseError('单元格未按行排列')
+        cells[row, col] = value
+        nrows = max(nrows, row + 1)
+        ncols = max(ncols, col + 1)
+        if nrows > 9 and ncols > 4:
+            break
+    
+    def cell(row, col):
+        # 超出xlrd的行列范围时由完整解析给出相同的异常
+        if row >= nrows or col >= ncols:
+            raise FastParseError('主机概况单元格越界')
+        return cells.get((row, col), '')
+    
+    record = readHostInfo(cell)
+    
+    # 其它信息：找到“远程端口信息”后逐行读取端口块，遇到端口列为空的行即停止
+    port_start_row = -1
+    current = -1  # 当前正在收集的行
+    row_data = {}
+    ncols = 0
+    rows = []  # 端口块中已完整读取的行
+    done = False
+    cell_iter = iterBiffCells(mem, sheets['其它信息'], end, strings)
+    for row, col, value in cell_iter:
+        if row < current:
+            raise FastParseError('单元格未按行排列')
+        ncols = max(ncols, col + 1)
+        if port_start_row < 0:
+            if col == 0 and value == '远程端口信息':
+                port_start_row = row + 2
+            current = row
+            continue
+        if row != current:
+            if current >= port_start_row:
+                rows.append(row_data)
+                if not row_data.get(1):
+                    done = True
+            # 中间完全没有单元格的行视为空行
+            if row > current + 1 and row - 1 >= port_start_row:
+                done = True
+            if done:
+                break
+            current = row
+            row_data = {}
+        row_data[col] = value
+    else:
+        if port_start_row >= 0 and current >= port_start_row:
+            rows.append(row_data)
+    if port_start_row < 0:
+        return record
+    
+    # 状态列是否存在取决于整页的列数，尚未见到第5列时继续扫描剩余单元格确定列数
+    if ncols <= 4:
+        for row, col, value in cell_iter:
+            ncols = max(ncols, col + 1)
+    if ncols <= 4:
+        raise FastParseError('其它信息列数不足')
+    for row_data in rows:
+        row_data = [row_data.get(col, '') for col in range(ncols)]
+        if not row_data[1]:
+            break
+        try:
+            port_info = parsePortRow(row_data)
+            if port_info is not None:
+                record.addPort(*port_info)
+            elif stats is not None:
+                stats['skipped_rows'] += 1
+        except (ValueError, TypeError):
+            if stats is not None:
+                stats['skipped_rows'] += 1
+            continue  # 跳过无效的端口数据
+    return record
+
+
+def parseHostXls(contents, fast=True, stats=None):
+    """
+    解析单个主机xls文件，优先使用快速解析，布局不符合预期时回退到xlrd完整解析
+    Args:
+        contents: xls文件内容
+        fast: 是否尝试快速解析
+        stats: 统计字典（可选），提供时记录是否回退fallback和跳过的端口行数skipped_rows
+    Returns:
+        HostRecord: 包含主机信息和端口信息的主机记录
+    """
+    if fast:
+        try:
+            return readPortXlsFast(contents, stats)
+        except Exception:
+            if stats is not None:
+                stats['fallback'] = True
+                stats['skipped_rows'] = 0
+    return readPortXlsData(data=open_workbook(file_contents=contents), stats=stats)
+
+
+# output columns, shared by every writer
+HEADER = ['taskid', 'ip', 'hostname', 'system_type', 'scan_time',
+          'port', 'protocol', 'service', 'status', 'ip:port']
+
+
+# xlsx单个工作表的最大行数（含表头）
+XLSX_MAX_ROWS = 1048576
+
+
+# output backends, each one writes HEADER-shaped rows as they arrive
+class XlsxOutput:
+    """
+    xlsx输出（openpyxl只写模式），超过单表行数上限时自动续写到新的工作表
+    """
+    extension = '.xlsx'
+
+    def __init__(self, output, header):
+        self.output = output
+        self.header = header
+        self.workbook = Workbook(write_only=True)
+        self._newSheet()
+
+    def _newSheet(self):
+        self.sheet = self.workbook.create_sheet()
+        self.sheet.append(self.header)
+        self.rows = 1
+
+    def write(self, row):
+        if self.rows >= XLSX_MAX_ROWS:
+            self._newSheet()
+        self.sheet.append(row)
+        self.rows += 1
+
+    def close(self):
+        self.workbook.save(filename=self.output)
+        self.workbook.close()
+
+
+class CsvOutput:
+    """
+    csv输出，使用带BOM的UTF-8以便Excel直接打开
+    """
+    extension = '.csv'
+
+    def __init__(self, output, header):
+        self.file = open(output, 'w', newline='', encoding='utf-8-sig')
+        self.writer = csv.writer(self.file)
+        self.writer.writerow(header)
+        self.write = self.writer.writerow
+
+    def close(self):
+        self.file.close()
+
+
+class JsonlOutput:
+    """
+    JSON Lines输出，每行一个以列名为键的对象
+    """
+    extension = '.jsonl'
+
+    def __init__(self, output, header):
+        self.file = open(output, 'w', encoding='utf-8')
+        self.header = header
+
+    def write(self, row):
+        self.file.write(json.dumps(dict(zip(self.header, row)), ensure_ascii=False))
+        self.file.write('\n')
+
+    def close(self):
+        self.file.close()
+
+
+class SqliteOutput:
+    """
+    SQLite输出，数据写入ports表，按批次批量插入
+    列名中的非字母数字字符替换为下划线（ip:port -> ip_port）
+    """
+    extension = '.db'
+    batch_size = 5000
+
+    def __init__(self, output, header):
+        if path.exists(output):
+            Path(output).unlink()
+        self.conn = connect(str(output))
+        self.conn.execute('PRAGMA journal_mode=OFF')
+        self.conn.execute('PRAGMA synchronous=OFF')
+        columns = [sub(r'\W', '_', name) for name in header]
+        self.conn.execute(f'CREATE TABLE ports ({", ".join(columns)})')
+        self.insert = f'INSERT INTO ports VALUES ({", ".join("?" * len(columns))})'
+        self.rows = []
+
+    def write(self, row):
+        self.rows.append(row)
+        if len(self.rows) >= self.batch_size:
+            self.conn.executemany(self.insert, self.rows)
+            self.rows = []
 
+    def close(self):
+        self.conn.executemany(self.insert, self.rows)
+        self.conn.commit()
+        self.conn.close()
 
-# save data as .xlsx, openpyxl column and row begin at 1
-def save(path_, file, dic_list):
+
+class ParquetOutput:
+    """
+    Parquet输出（需要安装pyarrow），按批次写入行组
+    taskid为整数列，其余列统一保存为字符串（端口列中包含null和端口范围）
     """
-    将处理后的数据保存为xlsx格式
+    extension = '.parquet'
+    batch_size = 65536
+
+    def __init__(self, output, header):
+        self.header = header
+        self.schema = pa.schema([(name, pa.int64() if name == 'taskid' else pa.string()) for name in header])
+        self.writer = pq.ParquetWriter(str(output), self.schema)
+        self.rows = []
+
+    def write(self, row):
+        self.rows.append(row)
+        if len(self.rows) >= self.batch_size:
+            self._flush()
+
+    def _flush(self):
+        columns = list(zip(*self.rows)) if self.rows else [()] * len(self.header)
+        arrays = [pa.array(values if field.type == pa.int64() else
+                           [None if value is None else str(value) for value in values], type=field.type)
+                  for field, values in zip(self.schema, columns)]
+        self.writer.write_table(pa.Table.from_arrays(arrays, schema=self.schema))
+        self.rows = []
+
+    def close(self):
+        if self.rows:
+            self._flush()
+        self.writer.close()
+
+
+# 可选的输出格式
+WRITERS = {
+    'xlsx': XlsxOutput,
+    'csv': CsvOutput,
+    'jsonl': JsonlOutput,
+    'sqlite': SqliteOutput,
+    'parquet': ParquetOutput,
+}
+
+
+class TeeOutput:
+    """
+    把同一行同时写入多个输出（如输出文件和历史库）
+    """
+    def __init__(self, *writers):
+        self.writers = writers
+
+    def write(self, row):
+        for writer in self.writers:
+            writer.write(row)
+
+    def close(self):
+        for writer in self.writers:
+            writer.close()
+
+
+def outputOptions(collapse=False):
+    """
+    影响输出内容的选项摘要，记录在缓存中，选项变化时不跳过已处理的ZIP
+    """
+    return f'collapse={int(collapse)}'
+
+
+def outputPath(path_, file, fmt='xlsx'):
+    """
+    返回ZIP文件对应的输出文件路径
+    """
+    return Path(f'{path_}/{path.splitext(file)[0]}{WRITERS[fmt].extension}')
+
+
+# save data, xlsx by default
+def save(path_, file, records, total=None, reporter=None, fmt='xlsx', collapse=False, metrics=None, store=None):
+    """
+    将处理后的数据以流式方式保存，内存占用与任务大小无关
     Args:
         path_: 输出文件路径
         file: 原始ZIP文件名
-        dic_list: 包含所有主机和端口信息的字典列表
+        records: 主机记录的列表或生成器（如iterZipData()）
+        total: 主机总数，用于显示进度；records为列表时可省略
+        reporter: 批量处理时的BatchProgress，提供时由其汇总显示进度
+        fmt: 输出格式，WRITERS中的键（默认xlsx）
+        collapse: 端口范围是否折叠为一行输出
+        metrics: PipelineMetrics，提供时记录写入、保存耗时和端口统计
+        store: ScanStore，提供时输出的行同时批量写入历史库
+    Returns:
+        Path: 输出文件路径
     """
     # 获取不带扩展名的文件名
     file_name = path.splitext(file)[0]
     
-    # 计算总行数（包含所有端口信息和没有端口信息的主机，加上标题行）
-    total = sum([len(dic[4]) for dic in dic_list]) + sum([1 for dic in dic_list if len(dic[4]) == 0]) + 1
+    # 进度按主机数计算，生成器无法预先统计端口行数
+    if total is None:
+        total = len(records)
     
     # 从文件名中提取任务ID
     taskid = int(file_name.split('_')[0])
     
-    # 创建新的Excel工作簿
-    output_xlsx = Workbook()
-    sheet = output_xlsx.active
-    
-    # 写入表头（新增 ip:port 列）
-    sheet.cell(row=1, column=1, value='taskid')
-    sheet.cell(row=1, column=2, value='ip')
-    sheet.cell(row=1, column=3, value='hostname')
-    sheet.cell(row=1, column=4, value='system_type')
-    sheet.cell(row=1, column=5, value='scan_time')
-    sheet.cell(row=1, column=6, value='port')
-    sheet.cell(row=1, column=7, value='protocol')
-    sheet.cell(row=1, column=8, value='service')
-    sheet.cell(row=1, column=9, value='status')
-    sheet.cell(row=1, column=10, value='ip:port')  # 新增列
-    
-    count = 1  # 当前处理的行数
+    # 创建输出，写入表头（新增 ip:port 列）；各格式均逐行写入，不在内存中保留整张表
+    output = outputPath(path_, file, fmt)
+    writer = WRITERS[fmt](output, HEADER)
+    # 历史库中端口范围总是逐个展开，按端口查询时不会遗漏；折叠输出时单独展开写入
+    importer = None
+    if store is not None:
+        importer = store.openImport(file_name, taskid)
+        if not collapse:
+            writer = TeeOutput(writer, importer)
+            importer = None
+    write = writer.write
+    
+    count = 0  # 当前处理的主机数
     feedback = 0  # 进度反馈
     
     # 遍历所有主机数据
-    for dic_data in dic_list:
-        # 处理没有端口信息的主机
-        if not (len(dic_data[4])):
-            # 写入主机基本信息
-            sheet.cell(row=count+1, column=1, value=taskid)
-            sheet.cell(row=count+1, column=2, value=dic_data[0])
-            sheet.cell(row=count+1, column=3, value=dic_data[1])
-            sheet.cell(row=count+1, column=4, value=dic_data[2])
-            sheet.cell(row=count+1, column=5, value=dic_data[3])
-            # 端口相关字段填充null
-            i = 6
-            while i <= 10:  # 修改循环范围以包含新列
-                sheet.cell(row=count+1, column=i, value='null')
-                i += 1
-            count += 1
+    for record in records:
+        if metrics is None:
+            for row in record.rows(taskid, collapse):
+                write(row)
         else:
-            # 处理有端口信息的主机
-            for i in range(len(dic_data[4])):
-                # 写入主机基本信息
-                sheet.cell(row=count + 1, column=1).value = taskid
-                sheet.cell(row=count + 1, column=2).value = dic_data[0]
-                sheet.cell(row=count + 1, column=3).value = dic_data[1]
-                sheet.cell(row=count + 1, column=4).value = dic_data[2]
-                sheet.cell(row=count + 1, column=5).value = dic_data[3]
-                # 写入端口信息
-                sheet.cell(row=count + 1, column=6).value = dic_data[4][i][1]
-                sheet.cell(row=count + 1, column=7).value = dic_data[4][i][2]
-                sheet.cell(row=count + 1, column=8).value = dic_data[4][i][3]
-                sheet.cell(row=count + 1, column=9).value = dic_data[4][i][4]
-                # 写入 ip:port 组合
-                sheet.cell(row=count + 1, column=10).value = f"{dic_data[0]}:{dic_data[4][i][1]}"
-                count += 1
+            started = perf_counter()
+            for row in record.rows(taskid, collapse):
+                write(row)
+            metrics.addRecord(file, record, collapse, perf_counter() - started)
+        if importer is not None:
+            for row in record.rows(taskid):
+                importer.write(row)
+        count += 1
         # 更新进度显示
-        feedback = progress(file_name, count, total, feedback, '读取')
+        if reporter is None:
+            feedback = progress(file_name, count, total, feedback, '读取')
+        else:
+            reporter.advance()
     
     # 保存文件
-    output = Path(f'{path_}/{file_name}.xlsx')
-    print(f'\t{Fore.GREEN}[+]{current_time()}\t正在保存文件，请稍候……')
-    output_xlsx.save(filename=output)
-    output_xlsx.close()
-    print(f'\t{Fore.GREEN}[+]{current_time()}\t文件[{file_name}]保存完毕。')
+    echo = print if reporter is None else reporter.log
+    echo(f'\t{Fore.GREEN}[+]{current_time()}\t文件[{file_name}]正在保存，请稍候……')
+    started = perf_counter()
+    writer.close()
+    if importer is not None:
+        importer.close()
+    if metrics is not None:
+        metrics.addStage('close', perf_counter() - started)
+    echo(f'\t{Fore.GREEN}[+]{current_time()}\t文件[{file_name}]保存完毕。')
+    return output
 
 
 # current time
@@ -272,31 +1298,1054 @@ def progress(file_name, count, total, feedback, type):
     return pct
 
 
+# batch progress
+class BatchProgress:
+    """
+    汇总显示整批ZIP文件的处理进度和预计剩余时间，可在多个线程中同时更新
+    """
+    def __init__(self, total_hosts, total_files):
+        self.total_hosts = total_hosts
+        self.total_files = total_files
+        self.done_hosts = 0
+        self.done_files = 0
+        self.started = monotonic()
+        self.last_shown = 0.0
+        self.lock = Lock()
+
+    def advance(self, hosts=1):
+        """
+        记录已处理的主机数，最多每0.5秒刷新一次进度行
+        """
+        with self.lock:
+            self.done_hosts += hosts
+            now = monotonic()
+            if now - self.last_shown >= 0.5 or self.done_hosts == self.total_hosts:
+                self.last_shown = now
+                self._show()
+
+    def finishFile(self):
+        """
+        记录一个ZIP文件处理完毕
+        """
+        with self.lock:
+            self.done_files += 1
+            self._show()
+
+    def log(self, message):
+        """
+        输出一条日志，并在其下方重新绘制进度行
+        """
+        with self.lock:
+            print(f'\r\033[K{message}')
+            self._show()
+
+    def _show(self):
+        elapsed = monotonic() - self.started
+        pct = floor(self.done_hosts / self.total_hosts * 100) if self.total_hosts else 100
+        if self.done_hosts and self.done_hosts < self.total_hosts:
+            eta = elapsed / self.done_hosts * (self.total_hosts - self.done_hosts)
+            eta_text = f'{int(eta // 60):02d}:{int(eta % 60):02d}'
+        else:
+            eta_text = '--:--'
+        print(f'\r\033[K{Fore.CYAN}[*]{current_time()}\t批量进度[文件 {self.done_files} / {self.total_files}  '
+              f'主机 {self.done_hosts} / {self.total_hosts}  {pct}%]\t已用时 {int(elapsed)}s\t预计剩余 {eta_text}',
+              end='', flush=True)
+
+
+# pipeline metrics
+class PipelineMetrics:
+    """
+    汇总一次运行中各阶段的耗时和计数，可在多个线程中同时更新，结束后写入JSON文件
+    阶段：list（读取中央目录）、inflate（解压主机报表）、parse（解析，含回退到xlrd的耗时）、cache（缓存查询）、
+    write（展开端口并写入输出）、close（保存输出文件，xlsx时为openpyxl落盘）；
+    inflate和parse在解析所在的进程中测量，多进程解析时为各进程耗时之和
+    """
+    SLOWEST_HOSTS = 20  # 记录耗时最长的主机数
+
+    def __init__(self, options=None):
+        self.options = options or {}
+        self.started = time()
+        self.started_clock = perf_counter()
+        self.stages = {}  # 阶段 -> [累计耗时, 次数, 单次最大耗时]
+        self.counters = dict.fromkeys(('hosts', 'no_port_hosts', 'port_records', 'port_ranges', 'expanded_ports',
+                                       'rows', 'skipped_rows', 'fast_fallbacks', 'cache_hits', 'cache_misses'), 0)
+        self.files = {}
+        self.slowest = []  # 最小堆，保留耗时最长的SLOWEST_HOSTS个主机
+        self.lock = Lock()
+
+    def _addStage(self, stage, seconds, count=1):
+        totals = self.stages.get(stage)
+        if totals is None:
+            totals = self.stages[stage] = [0.0, 0, 0.0]
+        totals[0] += seconds
+        totals[1] += count
+        if seconds > totals[2]:
+            totals[2] = seconds
+
+    def addStage(self, stage, seconds, count=1):
+        """
+        累加某个阶段的耗时
+        """
+        with self.lock:
+            self._addStage(stage, seconds, count)
+
+    def count(self, name, value=1):
+        """
+        累加计数
+        """
+        with self.lock:
+            self.counters[name] = self.counters.get(name, 0) + value
+
+    def addParse(self, archive, member, timing):
+        """
+        记录单个主机的解压、解析耗时
+        Args:
+            archive: ZIP文件名
+            member: 主机报表文件名
+            timing: parseMemberTimed()返回的耗时元组
+        """
+        inflate, parse, fallback, skipped = timing
+        item = (inflate + parse, archive, member, inflate, parse, fallback)
+        with self.lock:
+            self._addStage('inflate', inflate)
+            self._addStage('parse', parse)
+            self.counters['fast_fallbacks'] += fallback
+            self.counters['skipped_rows'] += skipped
+            if len(self.slowest) < self.SLOWEST_HOSTS:
+                heappush(self.slowest, item)
+            else:
+                heappushpop(self.slowest, item)
+
+    def addRecord(self, file, record, collapse, seconds):
+        """
+        记录单个主机的写入耗时和端口统计
+        Args:
+            file: ZIP文件名
+            record: 主机记录
+            collapse: 端口范围是否折叠输出
+            seconds: 写入耗时
+        """
+        ranges = expanded = 0
+        for start, end in zip(record.starts, record.ends):
+            if end > start:
+                ranges += 1
+                expanded += end - start + 1
+        rows = record.rowCount(collapse)
+        with self.lock:
+            self._addStage('write', seconds)
+            counters = self.counters
+            counters['hosts'] += 1
+            counters['no_port_hosts'] += not record.starts
+            counters['port_records'] += len(record)
+            counters['port_ranges'] += ranges
+            counters['expanded_ports'] += expanded
+            counters['rows'] += rows
+            totals = self.files.setdefault(file, {'hosts': 0, 'rows': 0})
+            totals['hosts'] += 1
+            totals['rows'] += rows
+
+    def finishFile(self, file, seconds, output):
+        """
+        记录单个ZIP文件的总耗时和输出文件
+        """
+        with self.lock:
+            totals = self.files.setdefault(file, {'hosts': 0, 'rows': 0})
+            totals['seconds'] = round(seconds, 6)
+            totals['output'] = str(output)
+
+    def toDict(self):
+        """
+        Returns:
+            dict: 可序列化为JSON的统计结果
+        """
+        with self.lock:
+            stages = {stage: {'seconds': round(total, 6), 'count': count,
+                              'mean_ms': round(total / count * 1000, 3) if count else 0.0,
+                              'max_ms': round(longest * 1000, 3)}
+                      for stage, (total, count, longest) in self.stages.items()}
+            slowest = [{'archive': archive, 'member': member, 'seconds': round(seconds, 6),
+                        'inflate_seconds': round(inflate, 6), 'parse_seconds': round(parse, 6),
+                        'fallback': bool(fallback)}
+                       for seconds, archive, member, inflate, parse, fallback in sorted(self.slowest, reverse=True)]
+            return {'started': strftime('%Y-%m-%d %H:%M:%S', localtime(self.started)),
+                    'wall_seconds': round(perf_counter() - self.started_clock, 6),
+                    'options': self.options, 'stages': stages, 'counters': dict(self.counters),
+                    'files': {file: dict(totals) for file, totals in self.files.items()},
+                    'slowest_hosts': slowest}
+
+    def write(self, output):
+        """
+        将统计结果写入JSON文件
+        Returns:
+            Path: 输出文件路径
+        """
+        output = Path(output)
+        output.write_text(json.dumps(self.toDict(), ensure_ascii=False, indent=2), encoding='utf-8')
+        return output
+
+    def summary(self, limit=5):
+        """
+        Returns:
+            list: 在控制台显示的摘要行（各阶段累计耗时和最慢的主机）
+        """
+        result = self.toDict()
+        lines = ['\t'.join(f'{stage} {values["seconds"]:.2f}s' for stage, values in result['stages'].items())]
+        for host in result['slowest_hosts'][:limit]:
+            lines.append(f'{host["archive"]}/{host["member"]}\t{host["seconds"] * 1000:.1f}ms'
+                         f'{"（回退到xlrd）" if host["fallback"] else ""}')
+        return lines
+
+
+def processFile(path_, file, members, workers=1, pool=None, reporter=None, cache=None, fmt='xlsx', collapse=False,
+                fast=True, metrics=None, store=None):
+    """
+    解析单个ZIP文件并保存结果
+    Args:
+        path_: ZIP文件所在路径
+        file: ZIP文件名
+        members: listHostMembers()的结果
+        workers: 并行解析的进程数
+        pool: 共享的ProcessPoolExecutor
+        reporter: 批量处理时的BatchProgress
+        cache: ResultCache，提供时复用未变化主机的解析结果
+        fmt: 输出格式
+        collapse: 端口范围是否折叠为一行输出
+        fast: 是否优先使用快速解析
+        metrics: PipelineMetrics，提供时记录各阶段耗时
+        store: ScanStore，提供时结果同时写入历史库
+    """
+    started = perf_counter()
+    # 解析结果以生成器形式直接流入写入端，峰值内存不随任务规模增长
+    records = iterZipData(path_, file, workers=workers, pool=pool, members=members, cache=cache, reporter=reporter,
+                          fast=fast, metrics=metrics)
+    output = save(path_, file, records, total=len(members), reporter=reporter, fmt=fmt, collapse=collapse,
+                  metrics=metrics, store=store)
+    if metrics is not None:
+        metrics.finishFile(file, perf_counter() - started, output)
+    if cache is not None:
+        cache.recordArchive(Path(f'{path_}/{file}'), output, outputOptions(collapse))
+        cache.evict()
+    if reporter is not None:
+        reporter.finishFile()
+
+
+def scheduleBatch(path_, files, workers=1, jobs=0, cache=None, fmt='xlsx', collapse=False, fast=True,
+                  metrics=None, profiles=None, store=None, pool=None):
+    """
+    批量处理多个ZIP文件：按解压后总大小从大到小排序，在共享的进程预算内同时处理多个文件
+    Args:
+        path_: ZIP文件所在路径
+        files: ZIP文件名列表
+        workers: 所有文件共用的解析进程总数
+        jobs: 同时处理的文件数，0为自动选择
+        cache: ResultCache，提供时跳过未变化的ZIP并复用主机解析结果
+        fmt: 输出格式
+        collapse: 端口范围是否折叠为一行输出
+        fast: 是否优先使用快速解析
+        metrics: PipelineMetrics，提供时记录各阶段耗时
+        profiles: 列表，提供时在cProfile下处理每个文件，并把各线程的Profile追加到其中
+        store: ScanStore，提供时结果同时写入历史库，尚未入库的ZIP即使未变化也重新处理
+        pool: 常驻运行时共用的ProcessPoolExecutor，提供时不再创建（也不关闭）
+    Returns:
+        list: 处理失败的(文件名, 异常)列表
+    """
+    # 从中央目录读取成员信息，按解压后总大小排序，避免大任务排在最后拖慢整批进度
+    batch = []
+    for file in files:
+        if cache is not None and cache.archiveUnchanged(Path(f'{path_}/{file}'), outputPath(path_, file, fmt),
+                                                       outputOptions(collapse)) and \
+                (store is None or store.hasArchive(path.splitext(file)[0])):
+            print(f'{Fore.GREEN}[*]{current_time()}\t文件[{file}]自上次处理后未变化，跳过。')
+            continue
+        started = perf_counter()
+        members = listHostMembers(str(Path(f'{path_}/{file}')))
+        if metrics is not None:
+            metrics.addStage('list', perf_counter() - started)
+        batch.append((sum(member[4] for member in members), file, members))
+    batch.sort(key=lambda item: item[0], reverse=True)
+    
+    if jobs <= 0:
+        jobs = max(1, workers // 2)
+    jobs = min(jobs, len(batch)) or 1
+    reporter = BatchProgress(sum(len(members) for _, _, members in batch), len(batch)) if len(batch) > 1 else None
+    echo = print if reporter is None else reporter.log
+    
+    failed = []
+    # 所有文件共用一个进程池，避免重复启动子进程
+    local_pool = None
+    if pool is None and workers > 1 and batch:
+        pool = local_pool = ProcessPoolExecutor(max_workers=workers)
+    try:
+        with ThreadPoolExecutor(max_workers=jobs) as executor:
+            futures = {}
+            for index, (size, file, members) in enumerate(batch, 1):
+                echo(f'{Fore.GREEN}[*]{current_time()}\t正在处理第 {index}/{len(batch)} 个文件[{file}]（{len(members)} 台主机）。')
+                task = processFile if profiles is None else partial(profiledCall, profiles, processFile)
+                future = executor.submit(task, path_, file, members, workers=workers, pool=pool,
+                                         reporter=reporter, cache=cache, fmt=fmt, collapse=collapse,
+                                         fast=fast, metrics=metrics, store=store)
+                futures[future] = file
+            for future in as_completed(futures):
+                try:
+                    future.result()
+                except Exception as e:
+                    failed.append((futures[future], e))
+                    echo(f'{Fore.RED}[-]{current_time()}\t文件[{futures[future]}]处理失败：{str(e)}')
+    finally:
+        if local_pool is not None:
+            local_pool.shutdown()
+    if reporter is not None:
+        print()
+    return failed
+
+
+# scan diff
+# 差异结果的列：变化类型、主机信息、端口、变化前后的应用层协议/服务/状态
+DIFF_HEADER = ['change', 'ip', 'hostname', 'system_type', 'scan_time', 'port',
+               'old_protocol', 'old_service', 'old_status', 'new_protocol', 'new_service', 'new_status', 'ip:port']
+
+
+def outputRecords(file_path):
+    """
+    把提取结果文件（任意输出格式）按主机还原为主机记录，同一主机的行在结果中是连续的
+    输出中不含传输层协议，还原后的传输层协议为空；折叠输出的“起始-结束”还原为端口范围
+    Yields:
+        HostRecord: 主机记录
+    """
+    record = None
+    for row in readOutputRows(file_path):
+        taskid, ip, hostname, system_type, scan_time, port, protocol, service, status = row[:9]
+        if record is None or record.ip != ip:
+            if record is not None:
+                yield record
+            record = HostRecord(ip, hostname, system_type, scan_time)
+        if port in ('null', None, ''):
+            continue
+        if isinstance(port, str) and match(r'\d+-\d+$', port):
+            start, end = map(int, port.split('-'))
+        else:
+            start = end = port
+        record.addPort('', start, end, protocol, service, status)
+    if record is not None:
+        yield record
+
+
+def inputRecords(file_path, workers=1, pool=None, cache=None, fast=True):
+    """
+    读取差异比较的一侧：RSAS导出的ZIP直接解析，其它文件按提取结果读取
+    """
+    file_path = Path(file_path)
+    if file_path.suffix.lower() == '.zip':
+        return iterZipData(file_path.parent, file_path.name, workers=workers, pool=pool, cache=cache, fast=fast)
+    return outputRecords(file_path)
+
+
+def diffHost(old, new):
+    """
+    比较同一主机前后两次扫描的端口，按(IP, 端口)匹配，应用层协议、服务或状态不同视为变化
+    Args:
+        old: 上次扫描的主机记录
+        new: 本次扫描的主机记录
+    Yields:
+        tuple: (变化类型 added/removed/changed, 端口, 变化前的(协议, 服务, 状态), 变化后的(协议, 服务, 状态))
+    """
+    # 同一端口可能有多条记录（如TCP和UDP），按属性组合逐一抵消
+    before = {}
+    for port_range in old.ports():
+        label = (port_range.protocol, port_range.service, port_range.status)
+        for port in port_range.ports():
+            before.setdefault(port, []).append(label)
+    for port_range in new.ports():
+        label = (port_range.protocol, port_range.service, port_range.status)
+        for port in port_range.ports():
+            labels = before.get(port)
+            if not labels:
+                yield 'added', port, None, label
+            elif label in labels:
+                labels.remove(label)
+            else:
+                yield 'changed', port, labels.pop(0), label
+    for port, labels in before.items():
+        for label in labels:
+            yield 'removed', port, label, None
+
+
+def hostDiffRows(change, record, collapse=False):
+    """
+    新增或消失的主机，逐个端口输出（没有端口的主机输出一行null）
+    """
+    host = [change, record.ip, record.hostname, record.system_type, record.scan_time]
+    empty = [''] * 3
+    if not len(record):
+        yield host + ['null'] + empty * 2 + [f'{record.ip}:null']
+        return
+    for port_range in record.ports():
+        label = [port_range.protocol, port_range.service, port_range.status]
+        for port in (port_range.label(),) if collapse else port_range.ports():
+            old, new = (empty, label) if change == 'new_host' else (label, empty)
+            yield host + [port] + old + new + [f'{record.ip}:{port}']
+
+
+def diffScans(old_path, new_path, output, fmt='xlsx', workers=1, cache=None, fast=True, collapse=False):
+    """
+    比较两次扫描（RSAS导出的ZIP或提取结果文件），流式写出差异
+    只在内存中保留上次扫描的主机记录，本次扫描逐个主机读取、比较后即丢弃
+    Args:
+        old_path: 上次扫描
+        new_path: 本次扫描
+        output: 差异结果文件路径
+        fmt: 输出格式，WRITERS中的键
+        workers: 解析ZIP的进程数
+        cache: ResultCache，解析ZIP时复用缓存
+        fast: 是否优先使用快速解析
+        collapse: 新增/消失主机的端口范围是否折叠为一行输出
+    Returns:
+        Counter: 新增/消失的主机数（new_host、removed_host）和新增/关闭/变化的端口数（added、removed、changed）
+    """
+    counts = Counter()
+    pool = ProcessPoolExecutor(max_workers=workers) if workers > 1 else None
+    try:
+        old_hosts = {}
+        for record in inputRecords(old_path, workers, pool, cache, fast):
+            if record.ip in old_hosts:
+                # 同一IP出现多次时合并端口
+                for port_range in record.ports():
+                    old_hosts[record.ip].addPort(*port_range)
+            else:
+                old_hosts[record.ip] = record
+        
+        writer = WRITERS[fmt](output, DIFF_HEADER)
+        write = writer.write
+        try:
+            for record in inputRecords(new_path, workers, pool, cache, fast):
+                old = old_hosts.pop(record.ip, None)
+                if old is None:
+                    for row in hostDiffRows('new_host', record, collapse):
+                        write(row)
+                    counts['new_host'] += 1
+                    continue
+                for change, port, before, after in diffHost(old, record):
+                    write([change, record.ip, record.hostname, record.system_type, record.scan_time, port,
+                           *(before or ('', '', '')), *(after or ('', '', '')), f'{record.ip}:{port}'])
+                    counts[change] += 1
+            for record in old_hosts.values():
+                for row in hostDiffRows('removed_host', record, collapse):
+                    write(row)
+                counts['removed_host'] += 1
+        finally:
+            writer.close()
+    finally:
+        if pool is not None:
+            pool.shutdown()
+    return counts
+
+
+# watch mode
+def isArchiveName(filename):
+    """
+    匹配文件名格式：数字_名称_年_月_日_xls.zip 或 数字_名称_年_月_日_excel.zip
+    """
+    return bool(match(r'\d+_\S+_\d{4}_\d{2}_\d{2}_xls\.zip', filename) or
+                match(r'\d+_\S+_\d{4}_\d{2}_\d{2}_excel\.zip', filename))
+
+
+class DirectoryWatcher:
+    """
+    等待目录发生变化：Linux上通过ctypes调用libc的inotify，目录中有文件写入完成或移入时立即返回；
+    其它系统或inotify不可用时退化为定时轮询
+    """
+    IN_CLOSE_WRITE = 0x00000008
+    IN_MOVED_TO = 0x00000080
+    IN_NONBLOCK = 0o4000
+    IN_CLOEXEC = 0o2000000
+
+    def __init__(self, directory):
+        self.fd = -1
+        if not platform.startswith('linux'):
+            return
+        try:
+            libc = CDLL(find_library('c') or 'libc.so.6', use_errno=True)
+            fd = libc.inotify_init1(self.IN_NONBLOCK | self.IN_CLOEXEC)
+            if fd < 0:
+                raise OSError(get_errno(), strerror(get_errno()))
+            if libc.inotify_add_watch(fd, str(directory).encode(), self.IN_CLOSE_WRITE | self.IN_MOVED_TO) < 0:
+                closeFd(fd)
+                raise OSError(get_errno(), strerror(get_errno()))
+            self.fd = fd
+        except (OSError, AttributeError):
+            self.fd = -1
+
+    @property
+    def mode(self):
+        return 'inotify' if self.fd >= 0 else '轮询'
+
+    def wait(self, timeout):
+        """
+        阻塞直到目录发生变化或超时（轮询模式下总是等待到超时）
+        """
+        if self.fd < 0:
+            sleep(timeout)
+            return
+        if select([self.fd], [], [], timeout)[0]:
+            # 只需要知道有变化，事件内容丢弃，由调用方重新扫描目录
+            try:
+                while readFd(self.fd, 65536):
+                    pass
+            except BlockingIOError:
+                pass
+
+    def close(self):
+        if self.fd >= 0:
+            closeFd(self.fd)
+            self.fd = -1
+
+
+def archiveComplete(zip_path):
+    """
+    ZIP的中央目录位于文件末尾，能正常读取即说明文件已完整写入
+    """
+    try:
+        with ZipFile(zip_path, 'r'):
+            return True
+    except (BadZipFile, OSError):
+        return False
+
+
+def moveArchive(zip_path, target_dir):
+    """
+    把处理过的ZIP移动到done或failed目录，同名文件直接覆盖
+    """
+    target_dir.mkdir(exist_ok=True)
+    zip_path.replace(target_dir / zip_path.name)
+
+
+def watchPending(path_, workers=1, jobs=0, cache=None, fmt='xlsx', collapse=False, fast=True, metrics=None,
+                 store=None, settle=2.0, interval=5.0):
+    """
+    常驻运行：监视pending目录，新放入的ZIP写入完成后立即处理，
+    处理成功的移动到pending/done，失败（或写入完成后仍无法读取）的移动到pending/failed，按Ctrl+C退出
+    Args:
+        path_: pending目录
+        settle: 文件大小和修改时间保持不变多少秒后视为写入完成
+        interval: 轮询模式下的扫描间隔秒数
+        其余参数同scheduleBatch()
+    Returns:
+        list: 运行期间处理失败的(文件名, 异常)列表
+    """
+    done_dir, failed_dir = path_ / 'done', path_ / 'failed'
+    watcher = DirectoryWatcher(path_)
+    print(f'{Fore.GREEN}[*]{current_time()}\t正在监视[{path_}]（{watcher.mode}），按Ctrl+C退出。')
+    seen = {}  # 文件名 -> ((大小, 修改时间), 首次观察到该状态的时间)
+    failed = []
+    # 常驻期间共用一个进程池，避免每个文件都重新启动子进程
+    pool = ProcessPoolExecutor(max_workers=workers) if workers > 1 else None
+    try:
+        while True:
+            now = monotonic()
+            ready = []
+            names = {filename for filename in listdir(path_)
+                     if isArchiveName(filename) and filename.endswith('.zip')}
+            for filename in names:
+                try:
+                    info = stat(path_ / filename)
+                except FileNotFoundError:
+                    continue
+                signature = (info.st_size, info.st_mtime_ns)
+                previous = seen.get(filename)
+                if previous is None or previous[0] != signature:
+                    seen[filename] = (signature, now)
+                elif now - previous[1] >= settle:
+                    ready.append(filename)
+            for filename in set(seen) - names:
+                del seen[filename]
+            
+            batch = []
+            for filename in ready:
+                del seen[filename]
+                if archiveComplete(path_ / filename):
+                    batch.append(filename)
+                else:
+                    failed.append((filename, BadZipFile('文件不完整或不是ZIP')))
+                    print(f'{Fore.RED}[-]{current_time()}\t文件[{filename}]不完整或不是ZIP，已移到[{failed_dir}]。')
+                    moveArchive(path_ / filename, failed_dir)
+            if batch:
+                errors = dict(scheduleBatch(path_, batch, workers=workers, jobs=jobs, cache=cache, fmt=fmt,
+                                            collapse=collapse, fast=fast, metrics=metrics, store=store, pool=pool))
+                for filename in batch:
+                    moveArchive(path_ / filename, failed_dir if filename in errors else done_dir)
+                failed.extend(errors.items())
+                print(f'{Fore.GREEN}[*]{current_time()}\t本批 {len(batch)} 个文件处理完毕'
+                      f'（失败 {len(errors)} 个），继续监视。')
+            
+            # 有文件正在写入时缩短等待，以便及时确认写入完成
+            if seen:
+                watcher.wait(max(0.2, settle / 2))
+            else:
+                watcher.wait(interval if watcher.fd < 0 else 60)
+    except KeyboardInterrupt:
+        print(f'\n{Fore.GREEN}[*]{current_time()}\t已停止监视。')
+    finally:
+        watcher.close()
+        if pool is not None:
+            pool.shutdown(cancel_futures=True)
+    return failed
+
+
+# service mode
+class JobProgress:
+    """
+    单个服务任务的进度，接口与BatchProgress相同，供iterZipData()和save()更新
+    """
+    def __init__(self, total_hosts):
+        self.total_hosts = total_hosts
+        self.done_hosts = 0
+        self.messages = deque(maxlen=20)  # 最近的日志，去掉颜色控制符
+
+    def advance(self, hosts=1):
+        self.done_hosts += hosts
+
+    def finishFile(self):
+        pass
+
+    def log(self, message):
+        self.messages.append(sub(r'\x1b\[[0-9;]*m', '', message).strip())
+
+
+class JobService:
+    """
+    本地任务队列：任务放入有界队列，由固定数量的线程依次处理；所有任务共用一个进程池、解析缓存和历史库，
+    省去每次启动程序和重新解析未变化主机的开销
+    """
+    FINISHED_KEEP = 200  # 最多保留的已结束任务数
+
+    def __init__(self, work_dir, workers=1, jobs=1, queue_size=16, cache=None, store=None, fast=True,
+                 path_root=None):
+        self.work_dir = Path(work_dir)
+        self.work_dir.mkdir(parents=True, exist_ok=True)
+        # 按服务器路径提交任务时允许的目录，None表示只接受本机发起的路径任务
+        self.path_root = Path(path_root).resolve() if path_root else None
+        self.stopping = Event()
+        self.workers = workers
+        self.cache = cache
+        self.store = store
+        self.fast = fast
+        self.queue = Queue(maxsize=queue_size)
+        self.jobs = {}
+        self.lock = Lock()
+        self.pool = ProcessPoolExecutor(max_workers=workers) if workers > 1 else None
+        self.threads = [Thread(target=self._run, daemon=True) for _ in range(jobs)]
+        for thread in self.threads:
+            thread.start()
+
+    def newUpload(self, filename):
+        """
+        为上传的ZIP分配任务目录
+        Returns:
+            tuple: (任务ID, 保存上传文件的路径)
+        """
+        job_id = uuid4().hex[:12]
+        job_dir = self.work_dir / job_id
+        job_dir.mkdir()
+        return job_id, job_dir / filename
+
+    def discard(self, job_id):
+        """
+        删除上传任务的目录（上传文件和处理结果），按路径提交的任务没有任务目录
+        """
+        rmtree(self.work_dir / job_id, ignore_errors=True)
+
+    def allowPath(self, zip_path, client):
+        """
+        判断是否接受按服务器路径提交的任务：配置了path_root时路径必须在其中，否则只接受本机的请求
+        Args:
+            zip_path: 已解析为绝对路径的ZIP路径
+            client: 客户端地址
+        """
+        if self.path_root is not None:
+            return zip_path.is_relative_to(self.path_root)
+        try:
+            return ip_address(client).is_loopback
+        except ValueError:
+            return False
+
+    def submit(self, zip_path, fmt='xlsx', collapse=False, job_id=None):
+        """
+        提交一个任务
+        Returns:
+            dict: 任务状态
+        Raises:
+            queue.Full: 队列已满
+        """
+        job = {'id': job_id or uuid4().hex[:12], 'file': zip_path.name, 'zip': str(zip_path), 'format': fmt,
+               'collapse': collapse, 'status': 'queued', 'submitted': current_time(), 'started': None,
+               'finished': None, 'output': None, 'error': None, 'progress': None}
+        with self.lock:
+            self.queue.put_nowait(job)
+            self.jobs[job['id']] = job
+            finished = [key for key, item in self.jobs.items() if item['status'] in ('done', 'failed')]
+            evicted = finished[:max(0, len(finished) - self.FINISHED_KEEP)]
+            for key in evicted:
+                del self.jobs[key]
+        # 淘汰的任务同时删除其上传文件和结果，避免任务目录无限增长
+        for key in evicted:
+            self.discard(key)
+        return self.status(job['id'])
+
+    def _run(self):
+        while True:
+            job = self.queue.get()
+            if job is None or self.stopping.is_set():
+                return
+            job['status'] = 'running'
+            job['started'] = current_time()
+            zip_path = Path(job['zip'])
+            try:
+                members = listHostMembers(str(zip_path))
+                job['progress'] = JobProgress(len(members))
+                processFile(zip_path.parent, zip_path.name, members, workers=self.workers, pool=self.pool,
+                            reporter=job['progress'], cache=self.cache, fmt=job['format'],
+                            collapse=job['collapse'], fast=self.fast, store=self.store)
+                job['output'] = str(outputPath(zip_path.parent, zip_path.name, job['format']))
+                job['status'] = 'done'
+            except Exception as e:
+                job['error'] = str(e)
+                job['status'] = 'failed'
+            job['finished'] = current_time()
+            print(f'{Fore.GREEN if job["status"] == "done" else Fore.RED}[*]{current_time()}\t'
+                  f'任务[{job["id"]}]文件[{job["file"]}]{"处理完毕" if job["status"] == "done" else "处理失败"}。')
+
+    def status(self, job_id):
+        """
+        Returns:
+            dict: 可序列化为JSON的任务状态，任务不存在时返回None
+        """
+        with self.lock:
+            job = self.jobs.get(job_id)
+            if job is None:
+                return None
+            result = {key: value for key, value in job.items() if key != 'progress'}
+        progress = job['progress']
+        result['hosts_total'] = progress.total_hosts if progress else None
+        result['hosts_done'] = progress.done_hosts if progress else 0
+        result['log'] = list(progress.messages) if progress else []
+        return result
+
+    def list(self):
+        with self.lock:
+            job_ids = list(self.jobs)
+        return [self.status(job_id) for job_id in job_ids]
+
+    def close(self):
+        # 队列已满时不阻塞：线程处理完当前任务后看到stopping即退出
+        self.stopping.set()
+        for _ in self.threads:
+            try:
+                self.queue.put_nowait(None)
+            except Full:
+                break
+        if self.pool is not None:
+            self.pool.shutdown(cancel_futures=True)
+
+
+class JobRequestHandler(BaseHTTPRequestHandler):
+    """
+    HTTP/JSON接口：
+        POST /jobs                  上传ZIP（请求体为文件内容，文件名放在?name=或X-Filename头中），
+                                    或提交JSON {"path": "服务器上的ZIP路径"}；可选参数format、collapse
+        GET  /jobs                  所有任务的状态
+        GET  /jobs/<ID>             单个任务的状态和进度
+        GET  /jobs/<ID>/result      下载处理结果
+    """
+    def _json(self, code, data, headers=None):
+        body = json.dumps(data, ensure_ascii=False).encode('utf-8')
+        self.send_response(code)
+        self.send_header('Content-Type', 'application/json; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        service = self.server.service
+        parts = [part for part in urlparse(self.path).path.split('/') if part]
+        if not parts:
+            return self._json(200, {'status': 'ok', 'queued': service.queue.qsize(), 'jobs': len(service.jobs)})
+        if parts == ['jobs']:
+            return self._json(200, service.list())
+        if len(parts) not in (2, 3) or parts[0] != 'jobs' or (len(parts) == 3 and parts[2] != 'result'):
+            return self._json(404, {'error': '未知的路径'})
+        job = service.status(parts[1])
+        if job is None:
+            return self._json(404, {'error': '任务不存在'})
+        if len(parts) == 2:
+            return self._json(200, job)
+        if job['status'] != 'done':
+            return self._json(409, {'error': f'任务尚未完成（{job["status"]}）'})
+        output = Path(job['output'])
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/octet-stream')
+        self.send_header('Content-Length', str(output.stat().st_size))
+        self.send_header('Content-Disposition', f"attachment; filename*=UTF-8''{quote(output.name)}")
+        self.end_headers()
+        with open(output, 'rb') as fp:
+            copyfileobj(fp, self.wfile, 1 << 20)
+
+    def do_POST(self):
+        service = self.server.service
+        url = urlparse(self.path)
+        if url.path.rstrip('/') != '/jobs':
+            return self._json(404, {'error': '未知的路径'})
+        query = {key: values[-1] for key, values in parse_qs(url.query).items()}
+        length = self.headers.get('Content-Length')
+        if length is None:
+            return self._json(411, {'error': '缺少Content-Length'})
+        try:
+            length = int(length)
+        except ValueError:
+            length = -1
+        if length < 0:
+            return self._json(400, {'error': 'Content-Length无效'})
+        
+        job_id = None
+        upload = 'json' not in self.headers.get('Content-Type', '')
+        if not upload:
+            try:
+                body = json.loads(self.rfile.read(length) or b'{}')
+            except ValueError:
+                return self._json(400, {'error': '请求体不是有效的JSON'})
+            if not isinstance(body, dict):
+                return self._json(400, {'error': '请求体应为JSON对象'})
+            query.update(body)
+            zip_path = Path(str(query.get('path', ''))).resolve()
+            if not service.allowPath(zip_path, self.client_address[0]):
+                return self._json(403, {'error': '不允许按服务器路径提交该任务'})
+            if not zip_path.is_file():
+                return self._json(400, {'error': f'文件[{zip_path}]不存在'})
+        else:
+            filename = path.basename(query.get('name') or self.headers.get('X-Filename', ''))
+            if not filename:
+                return self._json(400, {'error': '缺少文件名（?name=或X-Filename）'})
+            zip_path = Path(filename)
+        if not (isArchiveName(zip_path.name) and zip_path.name.endswith('.zip')):
+            return self._json(400, {'error': '文件名应为 任务序号_任务名称_年_月_日_xls.zip'})
+        fmt = query.get('format', 'xlsx')
+        if fmt not in WRITERS or (fmt == 'parquet' and pa is None):
+            return self._json(400, {'error': f'不支持的输出格式[{fmt}]'})
+        collapse = str(query.get('collapse', '')).lower() in ('1', 'true', 'yes')
+        if service.queue.full():
+            return self._json(503, {'error': '任务队列已满，请稍后重试'}, {'Retry-After': '5'})
+        
+        if upload:
+            # 上传的文件逐块写入任务目录，不在内存中保留
+            job_id, zip_path = service.newUpload(zip_path.name)
+            with open(zip_path, 'wb') as fp:
+                while length > 0:
+                    block = self.rfile.read(min(length, 1 << 20))
+                    if not block:
+                        break
+                    fp.write(block)
+                    length -= len(block)
+            if length:
+                service.discard(job_id)
+                return self._json(400, {'error': '上传不完整'})
+        try:
+            job = service.submit(zip_path.resolve(), fmt, collapse, job_id)
+        except Full:
+            if job_id is not None:
+                service.discard(job_id)
+            return self._json(503, {'error': '任务队列已满，请稍后重试'}, {'Retry-After': '5'})
+        self._json(202, job, {'Location': f'/jobs/{job["id"]}'})
+
+    def log_message(self, format, *args):
+        print(f'{Fore.CYAN}[*]{current_time()}\t{self.address_string()} {format % args}')
+
+
+def serveJobs(address, work_dir, workers=1, jobs=1, queue_size=16, cache=None, store=None, fast=True,
+              path_root=None):
+    """
+    以本地HTTP/JSON服务方式常驻运行，按Ctrl+C退出
+    Args:
+        address: 监听地址，“端口”或“主机:端口”
+        work_dir: 保存上传文件和处理结果的目录
+        workers: 所有任务共用的解析进程数
+        jobs: 同时处理的任务数
+        queue_size: 排队任务数上限，超出后拒绝新任务（HTTP 503）
+        path_root: 允许按服务器路径提交任务的目录，None时只接受本机的路径任务
+    """
+    host, _, port = address.rpartition(':')
+    service = JobService(work_dir, workers=workers, jobs=jobs, queue_size=queue_size, cache=cache, store=store,
+                         fast=fast, path_root=path_root)
+    server = ThreadingHTTPServer((host or '127.0.0.1', int(port)), JobRequestHandler)
+    server.service = service
+    print(f'{Fore.GREEN}[*]{current_time()}\t服务已启动：http://{host or "127.0.0.1"}:{port}/jobs，按Ctrl+C退出。')
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print(f'\n{Fore.GREEN}[*]{current_time()}\t服务已停止。')
+    finally:
+        server.server_close()
+        service.close()
+
+
+def profiledCall(profiles, func, *args, **kwargs):
+    """
+    在cProfile下调用func，cProfile只分析启用它的线程，因此每个工作线程各自创建一个Profile
+    """
+    profiler = Profile()
+    try:
+        return profiler.runcall(func, *args, **kwargs)
+    finally:
+        profiles.append(profiler)
+
+
+# parse command line arguments
+def parseArgs(argv=None):
+    """
+    解析命令行参数，直接双击运行时全部使用默认值
+    Args:
+        argv: 参数列表（默认读取sys.argv）
+    Returns:
+        Namespace: 解析后的参数
+    """
+    parser = ArgumentParser(description='RSAS V6设备离线提取端口扫描报告')
+    parser.add_argument('-w', '--workers', type=int, default=0,
+                        help='并行解析主机报表的进程数，0为按CPU核数自动选择，1为串行（默认0）')
+    parser.add_argument('-j', '--jobs', type=int, default=0,
+                        help='同时处理的ZIP文件数，共享--workers进程预算，0为自动选择（默认0）')
+    parser.add_argument('-f', '--format', choices=sorted(WRITERS), default='xlsx',
+                        help='输出格式，xlsx超过1048576行时自动续写到新的工作表，parquet需要安装pyarrow（默认xlsx）')
+    parser.add_argument('--collapse-ranges', action='store_true',
+                        help='端口范围（如1-65535）只输出一行，端口列保留“起始-结束”，不逐个端口展开')
+    parser.add_argument('--no-fast-parse', action='store_true',
+                        help='不使用快速解析，所有主机报表都用xlrd完整解析')
+    parser.add_argument('--no-cache', action='store_true',
+                        help='不使用解析结果缓存，重新解析所有ZIP')
+    parser.add_argument('--cache-dir', default='',
+                        help='缓存目录（默认pending/.rsas_cache）')
+    parser.add_argument('--cache-size', type=int, default=1024,
+                        help='缓存容量上限（MB），超出后按最近使用时间淘汰（默认1024）')
+    parser.add_argument('--clear-cache', action='store_true',
+                        help='清空解析结果缓存后退出')
+    parser.add_argument('--store', default='', metavar='FILE',
+                        help='把结果同时写入跨任务的历史库（SQLite），可用rsas_store.py按IP、端口、服务、时间查询')
+    parser.add_argument('--diff', nargs=2, metavar=('OLD', 'NEW'),
+                        help='比较两次扫描（RSAS导出的ZIP或提取结果文件）的新增/关闭端口、新增/消失主机和服务变化，'
+                             '结果按-f格式保存在pending目录')
+    parser.add_argument('--watch', action='store_true',
+                        help='常驻运行：监视pending目录，新的ZIP写入完成后立即处理，成功的移到pending/done，'
+                             '失败的移到pending/failed，按Ctrl+C退出')
+    parser.add_argument('--settle', type=float, default=2.0,
+                        help='常驻运行时，文件大小和修改时间保持不变多少秒后视为写入完成（默认2）')
+    parser.add_argument('--poll-interval', type=float, default=5.0,
+                        help='常驻运行时无法使用inotify（非Linux）时的目录轮询间隔秒数（默认5）')
+    parser.add_argument('--serve', nargs='?', const='127.0.0.1:8765', default='', metavar='[HOST:]PORT',
+                        help='以本地HTTP/JSON任务服务方式常驻运行（默认127.0.0.1:8765），接收ZIP上传或服务器路径')
+    parser.add_argument('--path-root', default='', metavar='DIR',
+                        help='服务模式下允许按服务器路径提交任务的目录；不指定时只接受本机（127.0.0.1）发起的路径任务')
+    parser.add_argument('--queue-size', type=int, default=16,
+                        help='服务模式下排队任务数上限，超出后拒绝新任务（默认16）')
+    parser.add_argument('--metrics', nargs='?', const='', default=None, metavar='FILE',
+                        help='记录各阶段耗时、端口统计和最慢的主机，写入JSON文件（默认pending/rsas_metrics_时间.json）')
+    parser.add_argument('--profile', default='', metavar='FILE',
+                        help='使用cProfile分析主进程并保存到FILE，可用python -m pstats查看；'
+                             '解析在子进程中进行，需要分析解析时配合-w 1使用')
+    args = parser.parse_args(argv)
+    if args.format == 'parquet' and pa is None:
+        parser.error('parquet输出需要先安装pyarrow：pip install pyarrow')
+    return args
+
+
 # main program
-def main():
+def main(argv=None):
     """
     主程序入口
     处理pending目录下的所有符合命名规则的ZIP文件
+    Args:
+        argv: 命令行参数列表（默认读取sys.argv）
     """
+    args = parseArgs(argv)
+    workers = resolveWorkers(args.workers)
     files = []
     # 获取pending目录路径
     path_ = Path(f'{getcwd()}/pending')
     
     # 查找符合命名规则的ZIP文件
     for filename in listdir(path_):
-        # 匹配文件名格式：数字_名称_年_月_日_xls.zip 或 数字_名称_年_月_日_excel.zip
-        if match(r'\d+_\S+_\d{4}_\d{2}_\d{2}_xls\.zip', filename) or match(r'\d+_\S+_\d{4}_\d{2}_\d{2}_excel\.zip', filename):
+        if isArchiveName(filename):
             files.append(filename)
     
-    # 处理每个找到的文件
-    for file in files:
-        print(f'{Fore.GREEN}[*]{current_time()}\t正在处理第 {files.index(file) + 1}/{len(files)} 个文件。')
-        dic_list = readZipData(path_, file)
-        save(path_, file, dic_list)
+    cache = None
+    if not args.no_cache or args.clear_cache:
+        cache = ResultCache(args.cache_dir or path_ / '.rsas_cache', max_bytes=args.cache_size << 20)
+    if args.clear_cache:
+        cache.clear()
+        cache.close()
+        print(f'{Fore.GREEN}[*]{current_time()}\t缓存已清空。')
+        return
+
+    if args.diff:
+        # 文件名可以是相对当前目录的路径，也可以是pending目录下的文件名
+        old_path, new_path = (Path(name) if Path(name).exists() else path_ / name for name in args.diff)
+        output = path_ / f'diff_{old_path.stem}_{new_path.stem}{WRITERS[args.format].extension}'
+        print(f'{Fore.GREEN}[*]{current_time()}\t正在比较[{old_path.name}]和[{new_path.name}]……')
+        try:
+            counts = diffScans(old_path, new_path, output, fmt=args.format, workers=workers, cache=cache,
+                               fast=not args.no_fast_parse, collapse=args.collapse_ranges)
+        finally:
+            if cache is not None:
+                cache.close()
+        summary = '，'.join(f'{change} {counts[change]}'
+                           for change in ('new_host', 'removed_host', 'added', 'removed', 'changed'))
+        print(f'{Fore.GREEN}[*]{current_time()}\t差异已保存到[{output}]：{summary}。')
+        return
+
+    metrics = None
+    if args.metrics is not None:
+        metrics = PipelineMetrics({'workers': workers, 'jobs': args.jobs, 'format': args.format,
+                                   'collapse_ranges': args.collapse_ranges, 'fast_parse': not args.no_fast_parse,
+                                   'cache': cache is not None, 'files': len(files)})
+    profiles = [] if args.profile else None
+    store = ScanStore(args.store) if args.store else None
+    
+    # 处理找到的所有文件；常驻运行时持续处理新放入的文件，直到按Ctrl+C
+    try:
+        if args.serve:
+            failed = []
+            serveJobs(args.serve, path_ / 'jobs', workers=workers, jobs=args.jobs or max(1, workers // 2),
+                      queue_size=args.queue_size, cache=cache, store=store, fast=not args.no_fast_parse,
+                      path_root=args.path_root or None)
+        elif args.watch:
+            failed = watchPending(path_, workers=workers, jobs=args.jobs, cache=cache, fmt=args.format,
+                                  collapse=args.collapse_ranges, fast=not args.no_fast_parse, metrics=metrics,
+                                  store=store, settle=args.settle, interval=args.poll_interval)
+        else:
+            failed = scheduleBatch(path_, files, workers=workers, jobs=args.jobs, cache=cache, fmt=args.format,
+                                   collapse=args.collapse_ranges, fast=not args.no_fast_parse, metrics=metrics,
+                                   profiles=profiles, store=store)
+    finally:
+        if cache is not None:
+            cache.close()
+        if store is not None:
+            store.close()
+    
+    if profiles:
+        Stats(*profiles).dump_stats(args.profile)
+        print(f'{Fore.GREEN}[*]{current_time()}\t性能分析结果已保存到[{args.profile}]。')
+    
+    if metrics is not None:
+        output = metrics.write(args.metrics or path_ / f'rsas_metrics_{strftime("%Y%m%d_%H%M%S", localtime())}.json')
+        for line in metrics.summary():
+            print(f'{Fore.CYAN}[*]{current_time()}\t{line}')
+        print(f'{Fore.GREEN}[*]{current_time()}\t运行统计已保存到[{output}]。')
     
+    if failed:
+        print(f'{Fore.RED}[-]{current_time()}\t{len(failed)} 个文件处理失败：{", ".join(file for file, _ in failed)}')
     print(f'{Fore.GREEN}[*]{current_time()}\t所有数据已处理完毕。')
-    system('pause')  # 等待用户按键后退出
+    if not (args.watch or args.serve):
+        system('pause')  # 等待用户按键后退出
 
 
 if __name__ == "__main__":
+    freeze_support()  # pyinstaller打包后子进程需要
     main()
@@ -0,0 +1,824 @@
+# coding=utf-8
+"""
+IP地址段统计的核心逻辑，不依赖tkinter，可在无图形界面的环境中导入使用：
+    from ip_asset_core import load_ipv4_file, count_ip_ranges, write_sections
+    loaded = load_ipv4_file('ips.txt')
+    write_sections(count_ip_ranges(loaded, prefixes=[24, 16, 20]), 'ip段统计.csv')
+命令行和图形界面的入口为ip_asset_check.py
+"""
+import ipaddress
+import csv
+import heapq
+from bisect import bisect_right
+import io
+import json
+import os
+import socket
+import sys
+from array import array
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
+from itertools import groupby, islice
+from pathlib import Path
+from re import compile as re_compile
+from zipfile import ZipFile
+
+from rsas_store import readOutputRows
+
+# 可选依赖：安装numpy后使用向量化统计
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+
+def parse_ipv4(ips):
+    """
+    将IPv4地址字符串一次性解析为32位无符号整数数组
+    Args:
+        ips: IP地址字符串序列
+    Returns:
+        tuple: (整数数组, 不是IPv4地址的字符串列表)，安装numpy时为numpy.ndarray，否则为array('I')
+    """
+    packed = []
+    invalid = []
+    pton = socket.inet_pton
+    for ip in ips:
+        try:
+            packed.append(pton(socket.AF_INET, ip))
+        except OSError:
+            invalid.append(ip)
+    data = b''.join(packed)
+    if np is not None:
+        return np.frombuffer(data, dtype='>u4').astype(np.uint32), invalid
+    values = array('I')
+    values.frombytes(data)
+    if sys.byteorder == 'little':
+        values.byteswap()
+    return values, invalid
+
+
+def parse_ipv6(ips):
+    """
+    将IPv6地址字符串解析为128位整数
+    Args:
+        ips: IP地址字符串序列（通常为parse_ipv4()剩下的部分）
+    Returns:
+        tuple: (整数列表, 无效地址列表)
+    """
+    values = []
+    invalid = []
+    pton = socket.inet_pton
+    for ip in ips:
+        try:
+            values.append(int.from_bytes(pton(socket.AF_INET6, ip), 'big'))
+        except OSError:
+            invalid.append(ip)
+    return values, invalid
+
+
+# 读取结果：去重排序后的IPv4整数数组、去重排序后的IPv6整数列表、原始（非空）行数、去重后数量、无效地址列表
+IPLoad = namedtuple('IPLoad', 'values values6 original unique invalid')
+
+# 每次读取并解析的行数
+CHUNK_LINES = 1 << 18
+
+class ProcessingCancelled(Exception):
+    """
+    用户取消了处理
+    """
+
+
+def merge_unique(runs):
+    """
+    合并多个已排序且各自无重复的整数数组，去掉跨数组的重复值
+    """
+    if np is not None:
+        if not runs:
+            return np.empty(0, dtype=np.uint32)
+        return np.unique(np.concatenate(runs))
+    merged = array('I')
+    last = None
+    for value in heapq.merge(*runs):
+        if value != last:
+            merged.append(value)
+            last = value
+    return merged
+
+
+def load_ipv4_file(file_path, chunk_lines=CHUNK_LINES, progress=None, cancel=None):
+    """
+    读取IP文件，file_path为'-'时从标准输入读取
+    Args:
+        file_path: IP文件路径，每行一个地址
+        chunk_lines: 每块的行数
+        progress: 进度回调（可选），每读完一块调用progress(已读取字符数, 文件大小)，标准输入不报告进度
+        cancel: threading.Event（可选），被设置时抛出ProcessingCancelled
+    Returns:
+        IPLoad: 去重排序后的整数数组及各项计数
+    """
+    if str(file_path) == '-':
+        stdin = io.TextIOWrapper(sys.stdin.buffer, encoding='utf-8-sig', errors='replace')
+        return load_ips(stdin, chunk_lines=chunk_lines, cancel=cancel)
+    total_size = os.path.getsize(file_path)
+    with open(file_path, 'r', encoding='utf-8-sig', errors='replace') as file:
+        return load_ips(file, total_size, chunk_lines, progress, cancel)
+
+
+def load_ips(file, total_size=0, chunk_lines=CHUNK_LINES, progress=None, cancel=None):
+    """
+    单次流式读取IP列表：按块读取并解析为整数，块内去重排序后保存为紧凑的有序数组，最后归并去重
+    IPv4内存占用约为每个地址4字节，不保留地址字符串；IPv6地址（通常很少）保存为整数集合
+    Args:
+        file: 已打开的文本文件（或任意按行迭代的对象），每行一个地址
+        total_size: 文件大小，用于报告进度
+        chunk_lines, progress, cancel: 见load_ipv4_file()
+    Returns:
+        IPLoad: 去重排序后的整数数组及各项计数
+    """
+    runs = []
+    values6 = set()
+    original = 0
+    invalid = []
+    done_size = 0
+    while True:
+        if cancel is not None and cancel.is_set():
+            raise ProcessingCancelled()
+        lines = list(islice(file, chunk_lines))
+        if not lines:
+            break
+        if progress is not None:
+            # 地址为ASCII字符，字符数即字节数
+            done_size += sum(map(len, lines))
+            progress(done_size, total_size)
+        ips = [line.strip() for line in lines]
+        ips = [ip for ip in ips if ip]
+        original += len(ips)
+        values, others = parse_ipv4(ips)
+        if others:
+            others, bad = parse_ipv6(others)
+            values6.update(others)
+            invalid.extend(bad)
+        if np is not None:
+            run = np.unique(values)
+        else:
+            run = array('I', sorted(set(values)))
+        runs.append(run)
+        # 有序数组过多时提前归并，限制归并时的临时内存
+        if len(runs) >= 16:
+            runs = [merge_unique(runs)]
+    values = merge_unique(runs)
+    return IPLoad(values, sorted(values6), original, len(values) + len(values6), invalid)
+
+
+# RSAS导出ZIP中的主机报表，文件名即主机IP（x.x.x.x.xls）
+HOST_MEMBER = re_compile(r'((?:\d+\.){3}\d+)\.xls')
+
+# 提取脚本生成的结果文件，按ip列读取
+OUTPUT_SUFFIXES = ('.xlsx', '.csv', '.jsonl', '.db', '.parquet')
+
+
+def zip_member_ips(zip_path):
+    """
+    从RSAS导出ZIP的中央目录中读取主机IP，不解压也不解析任何报表
+    Returns:
+        list: 主机IP字符串
+    """
+    with ZipFile(zip_path, 'r') as f:
+        return [found.group(1) for found in map(HOST_MEMBER.fullmatch, f.namelist()) if found]
+
+
+def output_ips(file_path):
+    """
+    读取提取结果文件（xlsx、csv、jsonl、sqlite、parquet）ip列中不重复的地址，
+    结果文件每个端口一行，先在文件内去重可大幅减少返回的数据量
+    Returns:
+        list: 排序后的IP字符串
+    """
+    ips = set()
+    for row in readOutputRows(file_path):
+        if len(row) > 1 and row[1]:
+            ips.add(str(row[1]).strip())
+    return sorted(ips)
+
+
+def expand_sources(paths):
+    """
+    展开输入路径，目录展开为其中的全部ZIP文件
+    """
+    sources = []
+    for path in paths:
+        if str(path) != '-' and Path(path).is_dir():
+            sources.extend(sorted(Path(path).glob('*.zip')))
+        else:
+            sources.append(path)
+    return sources
+
+
+def iter_source_ips(paths, progress=None, workers=0):
+    """
+    依次产生多个输入源中的地址字符串：
+        *.zip: RSAS导出包，从成员文件名中读取主机IP
+        *.xlsx/*.csv/*.jsonl/*.db/*.parquet: 提取脚本的结果文件，读取ip列；多个结果文件时在进程池中并行读取
+        '-': 标准输入
+        其它: 每行一个地址的文本文件
+    Args:
+        paths: 输入路径列表
+        progress: 进度回调（可选），每读完一个输入源调用progress(已完成的文件大小, 文件总大小)
+        workers: 并行读取结果文件的进程数，0为按CPU核数自动选择
+    """
+    sizes = [0 if str(path) == '-' else os.path.getsize(path) for path in paths]
+    outputs = [path for path in paths if Path(str(path)).suffix.lower() in OUTPUT_SUFFIXES]
+    workers = min(workers or os.cpu_count() or 1, len(outputs))
+    pool = ProcessPoolExecutor(workers) if workers > 1 else None
+    try:
+        results = pool.map(output_ips, outputs) if pool is not None else map(output_ips, outputs)
+        done_size = 0
+        for path, size in zip(paths, sizes):
+            suffix = Path(str(path)).suffix.lower()
+            if str(path) == '-':
+                yield from io.TextIOWrapper(sys.stdin.buffer, encoding='utf-8-sig', errors='replace')
+            elif suffix == '.zip':
+                yield from zip_member_ips(path)
+            elif suffix in OUTPUT_SUFFIXES:
+                yield from next(results)
+            else:
+                with open(path, 'r', encoding='utf-8-sig', errors='replace') as file:
+                    yield from file
+            done_size += size
+            if progress is not None:
+                progress(done_size, sum(sizes))
+    finally:
+        if pool is not None:
+            pool.shutdown(cancel_futures=True)
+
+
+def load_sources(paths, chunk_lines=CHUNK_LINES, progress=None, cancel=None, workers=0):
+    """
+    从一个或多个输入源读取地址并统一去重，只有一个文本文件时与load_ipv4_file()相同
+    Args:
+        paths: 输入路径（字符串或列表），目录展开为其中的全部ZIP，见iter_source_ips()
+        chunk_lines, progress, cancel: 见load_ipv4_file()
+        workers: 见iter_source_ips()
+    Returns:
+        IPLoad: 去重排序后的整数数组及各项计数
+    """
+    if isinstance(paths, (str, Path)):
+        paths = [paths]
+    paths = expand_sources(paths)
+    if len(paths) == 1 and Path(str(paths[0])).suffix.lower() not in OUTPUT_SUFFIXES + ('.zip',):
+        return load_ipv4_file(paths[0], chunk_lines, progress, cancel)
+    return load_ips(iter_source_ips(paths, progress, workers), chunk_lines=chunk_lines, cancel=cancel)
+
+
+# IPv4/IPv6默认统计的前缀长度
+DEFAULT_PREFIXES = (24, 16)
+DEFAULT_PREFIXES6 = (64, 48, 32)
+
+# 常用前缀长度的统计标题，其它长度使用“网段统计（/N）”
+SECTION_TITLES = {8: 'A段统计（/8）', 16: 'B段统计（/16）', 24: 'C段统计（/24）'}
+
+
+def parse_prefixes(text, bits=32):
+    """
+    解析逗号或空格分隔的前缀长度列表，如“24,16,20”
+    Args:
+        text: 前缀长度文本
+        bits: 地址位数，IPv4为32，IPv6为128
+    Returns:
+        list: 去重后的前缀长度，保持输入顺序
+    Raises:
+        ValueError: 前缀长度不是整数或超出范围
+    """
+    prefixes = []
+    for item in text.replace('，', ',').replace(',', ' ').split():
+        prefix = int(item.strip().lstrip('/'))
+        if not 0 <= prefix <= bits:
+            raise ValueError(f"前缀长度超出范围（0-{bits}）: {item}")
+        if prefix not in prefixes:
+            prefixes.append(prefix)
+    return prefixes
+
+
+def group_prefix(keys, counts, shift):
+    """
+    将有序的网段号右移shift位得到上一级网段，并合并相同网段的计数
+    有序输入右移后仍然有序，只需找出相邻值变化的位置，不需要再排序
+    Args:
+        keys: 有序的网段号（numpy数组或整数序列）
+        counts: 各网段的地址数量，None表示每个网段计1
+        shift: 右移位数
+    Returns:
+        tuple: (上一级网段号, 地址数量)
+    """
+    if np is not None and isinstance(keys, np.ndarray):
+        keys = keys >> np.uint64(shift)
+        if len(keys) == 0:
+            return keys, np.zeros(0, dtype=np.int64)
+        starts = np.flatnonzero(np.concatenate(([True], keys[1:] != keys[:-1])))
+        if counts is None:
+            counts = np.diff(np.append(starts, len(keys)))
+        else:
+            counts = np.add.reduceat(counts, starts)
+        return keys[starts], counts
+    if counts is None:
+        counts = [1] * len(keys)
+    grouped_keys = []
+    grouped_counts = []
+    for network, group in groupby(zip(keys, counts), key=lambda pair: pair[0] >> shift):
+        grouped_keys.append(network)
+        grouped_counts.append(sum(count for _, count in group))
+    return grouped_keys, grouped_counts
+
+
+def format_network(network, prefix, bits=32):
+    """
+    将网段号格式化为CIDR字符串
+    """
+    return f'{format_address(network << (bits - prefix), bits)}/{prefix}'
+
+
+def format_address(address, bits=32):
+    """
+    将地址整数格式化为字符串
+    """
+    if bits == 32:
+        # 直接拼接四段十进制，比构造IPv4Address对象快数倍，百万级地址时差别明显
+        return f'{address >> 24}.{address >> 16 & 255}.{address >> 8 & 255}.{address & 255}'
+    return str(ipaddress.IPv6Address(address))
+
+
+def aggregate_prefixes(values, prefixes, bits=32):
+    """
+    前缀树式的逐级汇总：先按最长前缀统计，再由下一级的（网段, 数量）逐级合并出较短前缀，
+    每一级只处理上一级的网段而不是全部地址，一次遍历得到所有前缀长度的统计
+    Args:
+        values: 去重排序后的地址整数（numpy数组、array('I')或整数列表）
+        prefixes: 前缀长度序列
+        bits: 地址位数，IPv4为32，IPv6为128
+    Returns:
+        dict: {前缀长度: {网段CIDR: 地址数量}}，每个网段按地址从小到大排列
+    """
+    if np is not None and bits == 32:
+        keys = np.asarray(values, dtype=np.uint64)
+    else:
+        keys = values
+    counts = None
+    current = bits
+    levels = {}
+    for prefix in sorted(set(prefixes), reverse=True):
+        keys, counts = group_prefix(keys, counts, current - prefix)
+        current = prefix
+        networks = keys.tolist() if hasattr(keys, 'tolist') else keys
+        totals = counts.tolist() if hasattr(counts, 'tolist') else counts
+        levels[prefix] = {format_network(network, prefix, bits): count
+                          for network, count in zip(networks, totals)}
+    return levels
+
+
+def address_runs(values):
+    """
+    将去重排序后的地址整数合并为连续区间
+    Returns:
+        list: [(起始地址, 结束地址)]
+    """
+    if np is not None and isinstance(values, np.ndarray):
+        if len(values) == 0:
+            return []
+        breaks = np.flatnonzero(np.diff(values.astype(np.int64)) != 1)
+        starts = np.concatenate(([0], breaks + 1))
+        ends = np.append(breaks, len(values) - 1)
+        return list(zip(values[starts].tolist(), values[ends].tolist()))
+    runs = []
+    for value in values:
+        if runs and runs[-1][1] == value - 1:
+            runs[-1][1] = value
+        else:
+            runs.append([value, value])
+    return [tuple(run) for run in runs]
+
+
+def cidr_cover(values, bits=32):
+    """
+    计算恰好覆盖全部存活地址的最少CIDR网段，结果与ipaddress.collapse_addresses相同，
+    但直接在整数区间上计算，数百万地址也很快
+    Args:
+        values: 去重排序后的地址整数
+        bits: 地址位数，IPv4为32，IPv6为128
+    Returns:
+        dict: {网段CIDR: 地址数量}，按地址从小到大排列
+    """
+    cover = {}
+    for start, end in address_runs(values):
+        while start <= end:
+            # 从start开始、按块大小对齐且不超过区间末尾的最大网段
+            size = start & -start or 1 << bits
+            while size > end - start + 1:
+                size >>= 1
+            prefix = bits - size.bit_length() + 1
+            cover[format_network(start >> (bits - prefix), prefix, bits)] = size
+            start += size
+    return cover
+
+
+def parse_range(text):
+    """
+    解析资产范围：CIDR（10.0.0.0/8）、起止地址（10.0.0.1-10.0.0.100）或单个地址
+    Returns:
+        tuple: (起始地址整数, 结束地址整数, 地址位数)
+    Raises:
+        ValueError: 格式错误
+    """
+    text = text.strip()
+    if '/' in text:
+        network = ipaddress.ip_network(text, strict=False)
+        return int(network.network_address), int(network.broadcast_address), network.max_prefixlen
+    if '-' in text:
+        start, end = (ipaddress.ip_address(item.strip()) for item in text.split('-', 1))
+        if start.version != end.version or start > end:
+            raise ValueError(f"起止地址无效: {text}")
+        return int(start), int(end), start.max_prefixlen
+    address = ipaddress.ip_address(text)
+    return int(address), int(address), address.max_prefixlen
+
+
+def disjoint_segments(entries):
+    """
+    将可能重叠的范围拆分为互不重叠的有序区间，重叠部分归属于包含它的最小范围（大小相同时以先出现的为准），
+    相邻且归属相同的区间合并
+    Args:
+        entries: [(起始地址, 结束地址, 范围序号)]
+    Returns:
+        tuple: (区间起点列表, 区间终点列表, 范围序号列表)
+    """
+    entries = sorted(entries)
+    points = sorted({start for start, _, _ in entries} | {end + 1 for _, end, _ in entries})
+    starts, ends, owners = [], [], []
+    active = []
+    index = 0
+    for position, point in enumerate(points[:-1]):
+        while index < len(entries) and entries[index][0] == point:
+            start, end, order = entries[index]
+            heapq.heappush(active, (end - start, order, end))
+            index += 1
+        # 堆顶为最小的范围，已结束的范围在到达堆顶时才移除
+        while active and active[0][2] < point:
+            heapq.heappop(active)
+        if not active:
+            continue
+        order = active[0][1]
+        end = points[position + 1] - 1
+        if owners and owners[-1] == order and ends[-1] + 1 == point:
+            ends[-1] = end
+        else:
+            starts.append(point)
+            ends.append(end)
+            owners.append(order)
+    return starts, ends, owners
+
+
+class OwnershipIndex:
+    """
+    资产归属索引：把资产清单中的CIDR和起止地址范围整理为互不重叠的有序整数区间，
+    查找时对区间起点二分查找，安装numpy时整批地址一次searchsorted，数百万地址只需不到一秒
+    """
+
+    def __init__(self, ranges, owners):
+        """
+        Args:
+            ranges: 资产范围文本列表，格式见parse_range()
+            owners: 与ranges对应的归属（部门、业务系统等）
+        Raises:
+            ValueError: 范围格式错误
+        """
+        self.ranges = list(ranges)
+        self.owners = list(owners)
+        families = {32: [], 128: []}
+        for order, text in enumerate(self.ranges):
+            start, end, bits = parse_range(text)
+            families[bits].append((start, end, order))
+        self.segments = {}
+        for bits, entries in families.items():
+            starts, ends, orders = disjoint_segments(entries)
+            if np is not None and bits == 32:
+                starts = np.array(starts, dtype=np.uint32)
+                ends = np.array(ends, dtype=np.uint32)
+                orders = np.array(orders, dtype=np.int64)
+            self.segments[bits] = (starts, ends, orders)
+
+    @classmethod
+    def from_file(cls, file_path):
+        """
+        读取资产清单：csv或txt，每行“范围,归属”（也可用制表符分隔，归属可省略），
+        #开头的行和无法解析的表头行跳过；文件为UTF-8或GBK编码
+        Raises:
+            ValueError: 除表头外有无法解析的范围时，列出前几个出错的行
+        """
+        try:
+            with open(file_path, 'r', encoding='utf-8-sig') as file:
+                lines = file.read().splitlines()
+        except UnicodeDecodeError:
+            # Excel另存的csv通常为GBK编码
+            with open(file_path, 'r', encoding='gbk') as file:
+                lines = file.read().splitlines()
+        ranges, owners, errors = [], [], []
+        header = True
+        for number, row in enumerate(csv.reader(lines, delimiter='\t' if '\t' in ''.join(lines[:10]) else ','), 1):
+            if not row or not row[0].strip() or row[0].lstrip().startswith('#'):
+                continue
+            try:
+                parse_range(row[0])
+            except ValueError:
+                # 第一行有效内容解析失败时视为表头
+                if not header:
+                    errors.append(f"第{number}行: {row[0]}")
+                header = False
+                continue
+            header = False
+            ranges.append(row[0].strip())
+            owners.append(row[1].strip() if len(row) > 1 else '')
+        if errors:
+            raise ValueError(f"资产清单中有{len(errors)}个无效范围: {'; '.join(errors[:5])}")
+        return cls(ranges, owners)
+
+    def lookup(self, values, bits=32):
+        """
+        查找每个地址所属的资产范围
+        Args:
+            values: 去重排序后的地址整数
+            bits: 地址位数，IPv4为32，IPv6为128
+        Returns:
+            与values等长的范围序号（numpy数组或列表），不在任何范围内时为-1
+        """
+        starts, ends, orders = self.segments[bits]
+        if np is not None and isinstance(starts, np.ndarray):
+            values = np.asarray(values, dtype=np.uint32)
+            if len(starts) == 0:
+                return np.full(len(values), -1, dtype=np.int64)
+            index = np.searchsorted(starts, values, side='right') - 1
+            clipped = np.maximum(index, 0)
+            found = (index >= 0) & (values <= ends[clipped])
+            return np.where(found, orders[clipped], -1)
+        result = []
+        for value in values:
+            index = bisect_right(starts, value) - 1
+            result.append(orders[index] if index >= 0 and value <= ends[index] else -1)
+        return result
+
+    def label(self, order):
+        """
+        资产范围的显示名称：“范围（归属）”
+        """
+        owner = self.owners[order]
+        return f'{self.ranges[order]}（{owner}）' if owner else self.ranges[order]
+
+
+# 资产归属的匹配结果：索引、IPv4/IPv6各地址所属的范围序号（与IPLoad中的数组对应，-1为未归属）
+Ownership = namedtuple('Ownership', 'index orders orders6')
+
+UNOWNED = '（未归属）'
+
+
+def match_inventory(loaded, index):
+    """
+    将读取的全部地址与资产清单匹配
+    Args:
+        loaded: load_sources()的结果
+        index: OwnershipIndex
+    Returns:
+        Ownership: 匹配结果
+    """
+    return Ownership(index, index.lookup(loaded.values), index.lookup(loaded.values6, bits=128))
+
+
+def ownership_counts(orders, size):
+    """
+    统计每个范围命中的地址数，最后一项为未归属的地址数
+    """
+    if np is not None and isinstance(orders, np.ndarray):
+        counts = np.bincount(orders + 1, minlength=size + 1).tolist()
+        return counts[1:] + counts[:1]
+    counts = [0] * (size + 1)
+    for order in orders:
+        # 未归属的序号-1正好对应最后一项
+        counts[order] += 1
+    return counts
+
+
+def unowned_values(values, orders):
+    """
+    取出不属于任何资产范围的地址
+    """
+    if np is not None and isinstance(orders, np.ndarray):
+        return values[orders < 0]
+    return [value for value, order in zip(values, orders) if order < 0]
+
+
+def ownership_sections(loaded, ownership):
+    """
+    资产归属的统计段：各归属的地址数、各资产范围的地址数、未归属地址所在的C段（IPv6为/64）
+    """
+    index = ownership.index
+    counts = ownership_counts(ownership.orders, len(index.ranges))
+    counts6 = ownership_counts(ownership.orders6, len(index.ranges))
+    totals = [count + count6 for count, count6 in zip(counts, counts6)]
+    by_owner = {}
+    by_range = {}
+    for order, total in enumerate(totals[:-1]):
+        if total:
+            owner = index.owners[order] or index.ranges[order]
+            by_owner[owner] = by_owner.get(owner, 0) + total
+            by_range[index.label(order)] = total
+    by_owner[UNOWNED] = totals[-1]
+    sections = [('资产归属统计', by_owner), ('资产范围统计', by_range)]
+    unowned = unowned_values(loaded.values, ownership.orders)
+    sections.append(('未归属C段（/24）', aggregate_prefixes(unowned, [24])[24]))
+    if loaded.values6:
+        unowned = unowned_values(loaded.values6, ownership.orders6)
+        sections.append(('未归属IPv6网段（/64）', aggregate_prefixes(unowned, [64], bits=128)[64]))
+    return sections
+
+
+def ownership_paths(output_file):
+    """
+    资产归属明细和未归属地址文件的路径：与输出文件同目录，文件名加后缀
+    """
+    output_file = Path(output_file)
+    return (output_file.with_name(f"{output_file.stem}_资产归属.csv"),
+            output_file.with_name(f"{output_file.stem}_未归属IP.txt"))
+
+
+def write_ownership(loaded, ownership, detail_file, unowned_file):
+    """
+    写出每个地址的归属明细（ip、资产范围、归属）和未归属地址列表
+    """
+    index = ownership.index
+    with open(detail_file, 'w', newline='', encoding='utf-8-sig') as detail, \
+            open(unowned_file, 'w', encoding='utf-8') as unowned:
+        writer = csv.writer(detail)
+        writer.writerow(['ip', '资产范围', '归属'])
+        for values, orders, bits in ((loaded.values, ownership.orders, 32),
+                                     (loaded.values6, ownership.orders6, 128)):
+            values = values.tolist() if hasattr(values, 'tolist') else values
+            orders = orders.tolist() if hasattr(orders, 'tolist') else orders
+            for value, order in zip(values, orders):
+                address = format_address(value, bits)
+                if order < 0:
+                    writer.writerow([address, '', UNOWNED])
+                    unowned.write(address)
+                    unowned.write('\n')
+                else:
+                    writer.writerow([address, index.ranges[order], index.owners[order]])
+
+
+def count_ip_ranges(loaded, prefixes=DEFAULT_PREFIXES, prefixes6=DEFAULT_PREFIXES6, cover=False, ownership=None):
+    """
+    统计IP地址段
+    Args:
+        loaded: load_ipv4_file()的结果
+        prefixes: IPv4统计的前缀长度，按此顺序输出
+        prefixes6: IPv6统计的前缀长度，没有IPv6地址时不输出
+        cover: 是否输出最少CIDR汇总
+        ownership: match_inventory()的结果（可选），附加资产归属的统计段
+    Returns:
+        list: [(统计标题, {网段CIDR: 地址数量})]
+    """
+    sections = []
+    levels = aggregate_prefixes(loaded.values, prefixes)
+    for prefix in prefixes:
+        sections.append((SECTION_TITLES.get(prefix, f'网段统计（/{prefix}）'), levels[prefix]))
+    if cover:
+        sections.append(('CIDR汇总', cidr_cover(loaded.values)))
+    if loaded.values6:
+        levels = aggregate_prefixes(loaded.values6, prefixes6, bits=128)
+        for prefix in prefixes6:
+            sections.append((f'IPv6网段统计（/{prefix}）', levels[prefix]))
+        if cover:
+            sections.append(('IPv6 CIDR汇总', cidr_cover(loaded.values6, bits=128)))
+    if ownership is not None:
+        sections.extend(ownership_sections(loaded, ownership))
+    return sections
+
+
+@contextmanager
+def open_output(output_file, newline=None):
+    """
+    打开输出文件，output_file为'-'时写到标准输出
+    """
+    if str(output_file) == '-':
+        yield sys.stdout
+        sys.stdout.flush()
+    else:
+        with open(output_file, 'w', newline=newline, encoding='utf-8') as file:
+            yield file
+
+
+def write_to_csv(sections, output_file):
+    """
+    将各前缀长度的统计结果依次写入CSV文件，每段之间空两行
+    """
+    with open_output(output_file, newline='') as csvfile:
+        writer = csv.writer(csvfile)
+        for index, (title, ranges) in enumerate(sections):
+            if index:
+                # 添加空行
+                writer.writerow([])
+                writer.writerow([])
+            writer.writerow([title, '存活ip数量'])
+            for network, count in ranges.items():
+                writer.writerow([network, count])
+
+
+def write_to_jsonl(sections, output_file):
+    """
+    每个网段一行JSON：{"section": 统计标题, "network": 网段CIDR, "count": 地址数量}，便于其它程序读取
+    """
+    with open_output(output_file) as file:
+        for title, ranges in sections:
+            for network, count in ranges.items():
+                file.write(json.dumps({'section': title, 'network': network, 'count': count}, ensure_ascii=False))
+                file.write('\n')
+
+
+# 支持的输出格式
+OUTPUT_FORMATS = {'csv': write_to_csv, 'jsonl': write_to_jsonl}
+
+
+def write_sections(sections, output_file, fmt=None):
+    """
+    按格式写出统计结果
+    Args:
+        sections: count_ip_ranges()的结果
+        output_file: 输出文件路径，'-'为标准输出
+        fmt: 输出格式，None时按扩展名判断（.jsonl为jsonl，其它为csv）
+    """
+    if fmt is None:
+        fmt = 'jsonl' if Path(str(output_file)).suffix.lower() == '.jsonl' else 'csv'
+    OUTPUT_FORMATS[fmt](sections, output_file)
+
+
+def reject_path(output_file):
+    """
+    无效地址文件的路径：与输出文件同目录，文件名加“_无效IP”后缀
+    """
+    output_file = Path(output_file)
+    return output_file.with_name(f"{output_file.stem}_无效IP.txt")
+
+
+def write_rejects(invalid, rejects):
+    """
+    将无效地址逐行写入一个文件
+    """
+    with open(rejects, 'w', encoding='utf-8') as file:
+        file.write('\n'.join(invalid))
+        file.write('\n')
+
+
+def process_ips(input_files, output_file, events, cancel,
+                prefixes=DEFAULT_PREFIXES, prefixes6=DEFAULT_PREFIXES6, cover=False, inventory=None):
+    """
+    图形界面在后台线程中执行的完整处理流程：读取去重、统计、写入结果，无效地址统一写入一个文件
+    进度和结果通过events队列发回界面线程：
+        ('progress', 说明文字, 0-100的进度)
+        ('done', [(统计标题, 统计结果)], IPLoad, 无效地址文件路径或None, Ownership或None)
+        ('cancelled',)
+        ('error', 错误信息)
+    Args:
+        input_files: 输入路径（字符串或列表），见load_sources()
+        output_file: 输出文件路径，扩展名为.jsonl时输出jsonl，否则为CSV
+        events: queue.Queue
+        cancel: threading.Event，被设置时尽快停止
+        prefixes, prefixes6, cover: 见count_ip_ranges()
+        inventory: 资产清单文件（可选），见OwnershipIndex.from_file()，归属明细写入输出文件同目录
+    """
+    try:
+        def progress(done_size, total_size):
+            events.put(('progress', f"正在读取文件... {done_size * 100 // max(total_size, 1)}%",
+                        80 * done_size / max(total_size, 1)))
+        
+        index = OwnershipIndex.from_file(inventory) if inventory else None
+        loaded = load_sources(input_files, progress=progress, cancel=cancel)
+        
+        rejects = None
+        if loaded.invalid:
+            rejects = reject_path(output_file)
+            write_rejects(loaded.invalid, rejects)
+        
+        if cancel.is_set():
+            raise ProcessingCancelled()
+        events.put(('progress', f"正在统计 {loaded.unique} 个IP的网段...", 85))
+        ownership = match_inventory(loaded, index) if index is not None else None
+        sections = count_ip_ranges(loaded, prefixes, prefixes6, cover, ownership)
+        
+        if cancel.is_set():
+            raise ProcessingCancelled()
+        events.put(('progress', "正在写入结果...", 95))
+        write_sections(sections, output_file)
+        if ownership is not None:
+            write_ownership(loaded, ownership, *ownership_paths(output_file))
+        events.put(('done', sections, loaded, rejects, ownership))
+    except ProcessingCancelled:
+        events.put(('cancelled',))
+    except Exception as e:
+        events.put(('error', str(e)))
@@ -0,0 +1,490 @@
+# coding=utf-8
+"""
+IP地址段统计工具的图形界面，统计逻辑见ip_asset_core.py
+"""
+import queue
+import threading
+import tkinter as tk
+from pathlib import Path
+from tkinter import filedialog, messagebox, ttk
+
+from ip_asset_core import (DEFAULT_PREFIXES, DEFAULT_PREFIXES6, UNOWNED, np, ownership_paths, parse_prefixes,
+                           process_ips)
+
+# 界面刷新间隔（毫秒），后台线程的进度消息在此间隔内合并显示
+POLL_INTERVAL_MS = 100
+
+
+class ResultView(ttk.Frame):
+    """
+    分页显示的统计结果：全部行只保存在内存的列表中，Treeview中始终只有当前可见的一页，
+    无论结果有多少行，翻页、排序后的刷新都只需插入一页的行
+    支持按网段或IP数量排序，按统计段（前缀长度）、网段前缀文本和最少IP数量筛选
+    """
+
+    ALL_SECTIONS = '全部'
+
+    def __init__(self, master, page_rows=10):
+        super().__init__(master)
+        self.page_rows = page_rows
+        self.titles = []
+        self.bounds = []
+        self.section_ids = []
+        self.networks = []
+        self.counts = []
+        self.view = []
+        self.offset = 0
+        self.sort_column = 'Network'
+        self.sort_reverse = False
+        
+        # 筛选条件
+        self.filter_frame = ttk.Frame(self)
+        self.filter_frame.grid(row=0, column=0, columnspan=2, sticky=(tk.W, tk.E), pady=(0, 5))
+        
+        self.section = tk.StringVar(value=self.ALL_SECTIONS)
+        self.section_box = ttk.Combobox(self.filter_frame, textvariable=self.section, width=16,
+                                        values=[self.ALL_SECTIONS], state='readonly')
+        self.section_box.grid(row=0, column=0, padx=(0, 5))
+        self.section_box.bind('<<ComboboxSelected>>', lambda event: self.apply_filter())
+        
+        ttk.Label(self.filter_frame, text="网段").grid(row=0, column=1)
+        self.network_filter = tk.StringVar()
+        network_entry = ttk.Entry(self.filter_frame, textvariable=self.network_filter, width=14)
+        network_entry.grid(row=0, column=2, padx=5)
+        network_entry.bind('<Return>', lambda event: self.apply_filter())
+        
+        ttk.Label(self.filter_frame, text="最少IP数").grid(row=0, column=3)
+        self.min_count = tk.StringVar()
+        count_entry = ttk.Entry(self.filter_frame, textvariable=self.min_count, width=6)
+        count_entry.grid(row=0, column=4, padx=5)
+        count_entry.bind('<Return>', lambda event: self.apply_filter())
+        
+        ttk.Button(self.filter_frame, text="筛选", command=self.apply_filter).grid(row=0, column=5)
+        
+        # 结果表格，行数固定为一页
+        self.tree = ttk.Treeview(self, columns=('Section', 'Network', 'Count'),
+                                 show='headings', height=page_rows, selectmode='browse')
+        self.tree.heading('Section', text='统计')
+        self.tree.heading('Network', text='网段', command=lambda: self.sort_by('Network'))
+        self.tree.heading('Count', text='IP数量', command=lambda: self.sort_by('Count'))
+        self.tree.column('Section', width=120)
+        self.tree.column('Network', width=200)
+        self.tree.column('Count', width=80)
+        self.tree.grid(row=1, column=0, sticky=(tk.W, tk.E, tk.N, tk.S))
+        
+        # 滚动条直接控制页的起始行，而不是滚动Treeview本身
+        self.scrollbar = ttk.Scrollbar(self, orient=tk.VERTICAL, command=self.on_scroll)
+        self.scrollbar.grid(row=1, column=1, sticky=(tk.N, tk.S))
+        
+        self.status = tk.StringVar(value="")
+        ttk.Label(self, textvariable=self.status).grid(row=2, column=0, columnspan=2, sticky=tk.W)
+        
+        self.tree.bind('<MouseWheel>', self.on_wheel)
+        self.tree.bind('<Button-4>', lambda event: self.scroll_to(self.offset - 3))
+        self.tree.bind('<Button-5>', lambda event: self.scroll_to(self.offset + 3))
+        self.tree.bind('<Prior>', lambda event: self.scroll_to(self.offset - self.page_rows))
+        self.tree.bind('<Next>', lambda event: self.scroll_to(self.offset + self.page_rows))
+        self.tree.bind('<Home>', lambda event: self.scroll_to(0))
+        self.tree.bind('<End>', lambda event: self.scroll_to(len(self.view)))
+        self.update_headings()
+        self.render()
+
+    def set_sections(self, sections):
+        """
+        载入新的统计结果，行按统计段、网段地址的顺序保存，这也就是按网段排序的顺序
+        Args:
+            sections: count_ip_ranges()的结果
+        """
+        self.titles = []
+        self.bounds = []
+        self.section_ids = []
+        self.networks = []
+        self.counts = []
+        for index, (title, ranges) in enumerate(sections):
+            start = len(self.networks)
+            self.titles.append(title)
+            self.networks.extend(ranges.keys())
+            self.counts.extend(ranges.values())
+            self.section_ids.extend([index] * len(ranges))
+            self.bounds.append((start, len(self.networks)))
+        if np is not None:
+            self.counts = np.array(self.counts, dtype=np.int64)
+        self.section_box['values'] = [self.ALL_SECTIONS] + self.titles
+        self.section.set(self.ALL_SECTIONS)
+        self.network_filter.set('')
+        self.min_count.set('')
+        self.apply_filter()
+
+    def apply_filter(self):
+        """
+        按当前筛选条件重新生成可见行的下标，并按当前排序列排序
+        """
+        try:
+            min_count = int(self.min_count.get() or 0)
+        except ValueError:
+            messagebox.showerror("错误", "最少IP数必须是整数")
+            return
+        title = self.section.get()
+        if title in self.titles:
+            start, end = self.bounds[self.titles.index(title)]
+        else:
+            start, end = 0, len(self.networks)
+        
+        if np is not None:
+            view = np.arange(start, end)
+            if min_count > 0:
+                view = view[self.counts[start:end] >= min_count]
+        else:
+            view = range(start, end)
+            if min_count > 0:
+                view = [i for i in view if self.counts[i] >= min_count]
+        text = self.network_filter.get().strip()
+        if text:
+            networks = self.networks
+            view = [i for i in view if networks[i].startswith(text)]
+            if np is not None:
+                view = np.array(view, dtype=np.int64)
+        self.view = view
+        self.sort_view()
+
+    def sort_by(self, column):
+        """
+        点击列标题排序，再次点击同一列时反向
+        """
+        if column == self.sort_column:
+            self.sort_reverse = not self.sort_reverse
+        else:
+            self.sort_column = column
+            # IP数量默认从多到少
+            self.sort_reverse = column == 'Count'
+        self.update_headings()
+        self.sort_view()
+
+    def sort_view(self):
+        """
+        在内存中排序可见行，按网段排序即下标顺序，按IP数量排序时数量相同的保持网段顺序
+        """
+        view = self.view
+        if self.sort_column == 'Count':
+            if np is not None:
+                view = np.sort(view)
+                keys = self.counts[view]
+                if self.sort_reverse:
+                    keys = -keys
+                view = view[np.argsort(keys, kind='stable')]
+            else:
+                counts = self.counts
+                view = sorted(view)
+                view.sort(key=lambda i: -counts[i] if self.sort_reverse else counts[i])
+        else:
+            view = np.sort(view) if np is not None else sorted(view)
+            if self.sort_reverse:
+                view = view[::-1]
+        self.view = view
+        self.scroll_to(0)
+
+    def update_headings(self):
+        """
+        在排序列的标题上显示排序方向
+        """
+        for column, text in (('Network', '网段'), ('Count', 'IP数量')):
+            if column == self.sort_column:
+                text += ' ▼' if self.sort_reverse else ' ▲'
+            self.tree.heading(column, text=text)
+
+    def scroll_to(self, offset):
+        """
+        跳转到从offset开始的一页
+        """
+        total = len(self.view)
+        self.offset = max(0, min(offset, total - self.page_rows))
+        self.render()
+        return 'break'
+
+    def on_scroll(self, action, value, unit=None):
+        """
+        滚动条回调，参数与Tk的yview命令相同
+        """
+        if action == 'moveto':
+            self.scroll_to(int(float(value) * len(self.view)))
+        elif unit == 'pages':
+            self.scroll_to(self.offset + int(value) * self.page_rows)
+        else:
+            self.scroll_to(self.offset + int(value))
+
+    def on_wheel(self, event):
+        # Windows/macOS的滚轮事件，delta每格为120（macOS为1）
+        step = -event.delta // 120 if abs(event.delta) >= 120 else -event.delta
+        return self.scroll_to(self.offset + step * 3)
+
+    def render(self):
+        """
+        只把当前页的行放入Treeview，耗时与结果总行数无关
+        """
+        self.tree.delete(*self.tree.get_children())
+        total = len(self.view)
+        page = self.view[self.offset:self.offset + self.page_rows]
+        for i in (page.tolist() if hasattr(page, 'tolist') else page):
+            self.tree.insert('', 'end', values=(self.titles[self.section_ids[i]], self.networks[i], int(self.counts[i])))
+        if total:
+            self.scrollbar.set(self.offset / total, min(self.offset + self.page_rows, total) / total)
+            self.status.set(f"第 {self.offset + 1}-{min(self.offset + self.page_rows, total)} 行，共 {total} 行")
+        else:
+            self.scrollbar.set(0, 1)
+            self.status.set("共 0 行" if self.networks else "")
+
+
+class IPRangeCounter(tk.Tk):
+    def __init__(self):
+        super().__init__()
+        
+        # 设置窗口
+        self.title("IP地址段统计工具")
+        self.geometry("500x780")
+        
+        # 使窗口居中显示
+        self.center_window()
+        
+        # 创建主框架
+        self.main_frame = ttk.Frame(self, padding="10")
+        self.main_frame.grid(row=0, column=0, sticky=(tk.W, tk.E, tk.N, tk.S))
+        
+        # 创建样式
+        style = ttk.Style()
+        style.configure('Custom.TButton', padding=5)
+        
+        # 输入文件选择
+        self.input_frame = ttk.LabelFrame(self.main_frame, text="输入文件", padding="5")
+        self.input_frame.grid(row=0, column=0, columnspan=2, sticky=(tk.W, tk.E), pady=5)
+        
+        self.input_path = tk.StringVar()
+        self.input_entry = ttk.Entry(self.input_frame, textvariable=self.input_path, width=50)
+        self.input_entry.grid(row=0, column=0, padx=5)
+        
+        self.input_button = ttk.Button(self.input_frame, text="选择文件", 
+                                     command=self.select_input_file, style='Custom.TButton')
+        self.input_button.grid(row=0, column=1, padx=5)
+        
+        # 输出文件选择
+        self.output_frame = ttk.LabelFrame(self.main_frame, text="输出文件", padding="5")
+        self.output_frame.grid(row=1, column=0, columnspan=2, sticky=(tk.W, tk.E), pady=5)
+        
+        self.output_path = tk.StringVar()
+        self.output_entry = ttk.Entry(self.output_frame, textvariable=self.output_path, width=50)
+        self.output_entry.grid(row=0, column=0, padx=5)
+        
+        self.output_button = ttk.Button(self.output_frame, text="选择文件", 
+                                      command=self.select_output_file, style='Custom.TButton')
+        self.output_button.grid(row=0, column=1, padx=5)
+        
+        # 进度显示
+        self.progress_frame = ttk.LabelFrame(self.main_frame, text="处理进度", padding="5")
+        self.progress_frame.grid(row=2, column=0, columnspan=2, sticky=(tk.W, tk.E), pady=5)
+        
+        self.progress_var = tk.StringVar(value="等待开始...")
+        self.progress_label = ttk.Label(self.progress_frame, textvariable=self.progress_var)
+        self.progress_label.grid(row=0, column=0, sticky=(tk.W, tk.E))
+        
+        self.progressbar = ttk.Progressbar(self.progress_frame, mode='determinate')
+        self.progressbar.grid(row=1, column=0, sticky=(tk.W, tk.E), pady=5)
+        
+        # 统计选项
+        self.option_frame = ttk.LabelFrame(self.main_frame, text="统计选项", padding="5")
+        self.option_frame.grid(row=3, column=0, columnspan=2, sticky=(tk.W, tk.E), pady=5)
+        
+        ttk.Label(self.option_frame, text="IPv4前缀").grid(row=0, column=0, padx=5)
+        self.prefixes = tk.StringVar(value=','.join(map(str, DEFAULT_PREFIXES)))
+        ttk.Entry(self.option_frame, textvariable=self.prefixes, width=12).grid(row=0, column=1, padx=5)
+        
+        ttk.Label(self.option_frame, text="IPv6前缀").grid(row=0, column=2, padx=5)
+        self.prefixes6 = tk.StringVar(value=','.join(map(str, DEFAULT_PREFIXES6)))
+        ttk.Entry(self.option_frame, textvariable=self.prefixes6, width=12).grid(row=0, column=3, padx=5)
+        
+        self.cover = tk.BooleanVar(value=False)
+        ttk.Checkbutton(self.option_frame, text="CIDR汇总", variable=self.cover).grid(row=0, column=4, padx=5)
+        
+        # 资产清单（可选），用于判断地址的归属
+        ttk.Label(self.option_frame, text="资产清单").grid(row=1, column=0, padx=5, pady=(5, 0))
+        self.inventory_path = tk.StringVar()
+        ttk.Entry(self.option_frame, textvariable=self.inventory_path, width=32).grid(
+            row=1, column=1, columnspan=3, sticky=(tk.W, tk.E), padx=5, pady=(5, 0))
+        ttk.Button(self.option_frame, text="选择", command=self.select_inventory_file).grid(
+            row=1, column=4, padx=5, pady=(5, 0))
+        
+        # 结果显示
+        self.result_frame = ttk.LabelFrame(self.main_frame, text="处理结果", padding="5")
+        self.result_frame.grid(row=4, column=0, columnspan=2, sticky=(tk.W, tk.E, tk.N, tk.S), pady=5)
+        
+        # 分页显示结果，可排序和筛选
+        self.result_view = ResultView(self.result_frame)
+        self.result_view.grid(row=0, column=0, sticky=(tk.W, tk.E, tk.N, tk.S))
+        
+        # 开始处理和取消按钮
+        self.process_button = ttk.Button(self.main_frame, text="开始处理", 
+                                       command=self.process_file, style='Custom.TButton')
+        self.process_button.grid(row=5, column=0, pady=10)
+        
+        self.cancel_button = ttk.Button(self.main_frame, text="取消", 
+                                      command=self.cancel_processing, style='Custom.TButton')
+        self.cancel_button.grid(row=5, column=1, pady=10)
+        self.cancel_button.state(['disabled'])
+
+    def center_window(self):
+        """
+        使窗口在屏幕中居中显示
+        """
+        # 获取屏幕宽度和高度
+        screen_width = self.winfo_screenwidth()
+        screen_height = self.winfo_screenheight()
+        
+        # 获取窗口宽度和高度
+        window_width = 500
+        window_height = 780
+        
+        # 计算居中位置
+        center_x = int((screen_width - window_width) / 2)
+        center_y = int((screen_height - window_height) / 2)
+        
+        # 设置窗口位置
+        self.geometry(f"{window_width}x{window_height}+{center_x}+{center_y}")
+
+    def select_input_file(self):
+        """
+        选择输入文件，可多选
+        默认打开当前目录，支持IP列表txt文件、RSAS导出的ZIP和提取脚本生成的结果文件，多个文件以“;”分隔
+        自动设置输出文件名为同目录下的ip段统计.csv
+        """
+        filenames = filedialog.askopenfilenames(
+            title="选择输入文件",
+            initialdir=Path.cwd(),  # 设置初始目录为当前目录
+            filetypes=[("Text files", "*.txt"), ("RSAS ZIP", "*.zip"),
+                       ("提取结果", "*.xlsx *.csv *.jsonl *.db *.parquet"), ("All files", "*.*")]
+        )
+        if filenames:
+            self.input_path.set('; '.join(filenames))
+            # 自动设置输出文件名
+            output_path = Path(filenames[0]).parent / "ip段统计.csv"
+            self.output_path.set(str(output_path))
+
+    def select_output_file(self):
+        """
+        选择输出文件
+        默认打开当前目录，默认文件名为ip_ranges.csv
+        """
+        filename = filedialog.asksaveasfilename(
+            title="选择保存位置",
+            initialdir=Path.cwd(),  # 设置初始目录为当前目录
+            initialfile="ip_ranges.csv",  # 设置默认文件名
+            defaultextension=".csv",
+            filetypes=[("CSV files", "*.csv"), ("JSON Lines", "*.jsonl"), ("All files", "*.*")]
+        )
+        if filename:
+            self.output_path.set(filename)
+
+    def select_inventory_file(self):
+        """
+        选择资产清单文件，每行“范围,归属”
+        """
+        filename = filedialog.askopenfilename(
+            title="选择资产清单",
+            initialdir=Path.cwd(),
+            filetypes=[("CSV files", "*.csv"), ("Text files", "*.txt"), ("All files", "*.*")]
+        )
+        if filename:
+            self.inventory_path.set(filename)
+
+    def process_file(self):
+        input_files = [path.strip() for path in self.input_path.get().split(';') if path.strip()]
+        output_file = self.output_path.get()
+        
+        if not input_files or not output_file:
+            messagebox.showerror("错误", "请选择输入和输出文件")
+            return
+        
+        try:
+            prefixes = parse_prefixes(self.prefixes.get())
+            prefixes6 = parse_prefixes(self.prefixes6.get(), bits=128)
+        except ValueError as e:
+            messagebox.showerror("错误", f"前缀长度格式错误: {e}")
+            return
+        
+        # 重置进度条
+        self.progressbar['value'] = 0
+        self.progressbar['maximum'] = 100
+        self.progress_var.set("正在读取文件...")
+        self.process_button.state(['disabled'])
+        self.cancel_button.state(['!disabled'])
+        
+        # 读取、统计和写入都在后台线程中进行，界面线程只定时取回进度
+        self.events = queue.Queue()
+        self.cancel_event = threading.Event()
+        self.worker = threading.Thread(target=process_ips,
+                                       args=(input_files, output_file, self.events, self.cancel_event,
+                                             prefixes, prefixes6, self.cover.get(),
+                                             self.inventory_path.get().strip() or None),
+                                       daemon=True)
+        self.worker.start()
+        self.after(POLL_INTERVAL_MS, self.poll_events)
+
+    def cancel_processing(self):
+        """
+        请求后台线程停止，当前数据块处理完后生效
+        """
+        self.cancel_event.set()
+        self.cancel_button.state(['disabled'])
+        self.progress_var.set("正在取消...")
+
+    def poll_events(self):
+        """
+        取回后台线程的消息，同一刷新间隔内的多条进度只显示最后一条
+        """
+        latest = None
+        finished = None
+        while True:
+            try:
+                event = self.events.get_nowait()
+            except queue.Empty:
+                break
+            if event[0] == 'progress':
+                latest = event
+            else:
+                finished = event
+        if latest is not None and not self.cancel_event.is_set():
+            self.progress_var.set(latest[1])
+            self.progressbar['value'] = latest[2]
+        if finished is None:
+            self.after(POLL_INTERVAL_MS, self.poll_events)
+            return
+        
+        self.process_button.state(['!disabled'])
+        self.cancel_button.state(['disabled'])
+        if finished[0] == 'done':
+            _, sections, loaded, rejects, ownership = finished
+            self.progressbar['value'] = 100
+            self.result_view.set_sections(sections)
+            self.progress_var.set("处理完成!")
+            summary = (f"原始IP数量: {loaded.original}\n"
+                       f"去重后数量: {loaded.unique}\n"
+                       f"重复IP数量: {loaded.original - len(loaded.invalid) - loaded.unique}\n")
+            if loaded.values6:
+                summary += f"其中IPv6数量: {len(loaded.values6)}\n"
+            if rejects is not None:
+                summary += f"无效IP数量: {len(loaded.invalid)}（已保存到: {rejects}）\n"
+            if ownership is not None:
+                unowned = dict(sections)['资产归属统计'][UNOWNED]
+                detail, unowned_file = ownership_paths(self.output_path.get())
+                summary += (f"\n已归属IP数量: {loaded.unique - unowned}\n"
+                            f"未归属IP数量: {unowned}（已保存到: {unowned_file}）\n"
+                            f"归属明细已保存到: {detail}\n")
+            messagebox.showinfo("成功", f"{summary}\n结果已保存到: {self.output_path.get()}")
+        elif finished[0] == 'cancelled':
+            self.progressbar['value'] = 0
+            self.progress_var.set("已取消")
+        else:
+            self.progress_var.set("处理失败")
+            messagebox.showerror("错误", f"处理过程中出错: {finished[1]}")
+
+
+def main():
+    app = IPRangeCounter()
+    app.mainloop()
@@ -0,0 +1,443 @@
+# coding=utf-8
+"""
+RSAS端口扫描报告提取工具的性能测试脚本
+
+用法：
+    python rsas_bench.py gen --hosts 5000 --out bench_data            生成模拟的RSAS导出包（需要xlwt）
+    python rsas_bench.py run --scales 100,1000,5000                    按多个规模测试各阶段吞吐量和峰值内存
+    python rsas_bench.py run --save baseline.json                      保存本次结果作为基线
+    python rsas_bench.py run --compare baseline.json                   与基线比较，变慢超过阈值时返回非0
+    python rsas_bench.py parse pending/1_扫描任务_2024_01_25_xls.zip    比较快速解析与xlrd完整解析
+"""
+import json
+import sys
+from argparse import ArgumentParser
+from concurrent.futures import ProcessPoolExecutor
+from importlib.util import spec_from_file_location, module_from_spec
+from io import BytesIO
+from pathlib import Path
+from random import Random
+from statistics import mean, median
+from subprocess import run
+from tempfile import TemporaryDirectory
+from time import perf_counter
+from zipfile import ZipFile, ZIP_DEFLATED
+
+# 常见端口及对应的应用层协议和服务
+COMMON_PORTS = [
+    (21, 'ftp', 'vsftpd'), (22, 'ssh', 'OpenSSH'), (23, 'telnet', 'telnetd'), (25, 'smtp', 'Postfix'),
+    (53, 'domain', 'dnsmasq'), (80, 'http', 'nginx'), (110, 'pop3', 'Dovecot'), (135, 'msrpc', 'Microsoft RPC'),
+    (139, 'netbios-ssn', 'Samba'), (443, 'https', 'Apache httpd'), (445, 'microsoft-ds', 'Windows SMB'),
+    (1433, 'ms-sql-s', 'Microsoft SQL Server'), (1521, 'oracle', 'Oracle TNS'), (3306, 'mysql', 'MySQL'),
+    (3389, 'ms-wbt-server', 'Microsoft Terminal Services'), (5432, 'postgresql', 'PostgreSQL'),
+    (6379, 'redis', 'Redis'), (8080, 'http-proxy', 'Apache Tomcat'), (8443, 'https-alt', 'Jetty'),
+    (9200, 'http', 'Elasticsearch'),
+]
+SYSTEM_TYPES = ['Linux', 'Microsoft Windows Server 2016', 'Microsoft Windows 10', 'CentOS 7', 'Ubuntu 20.04',
+                'H3C Comware', 'Huawei VRP']
+
+
+def loadExtractor():
+    """
+    加载同目录下的提取脚本（文件名含中文和版本号，无法直接import）
+    注册为sys.modules['rsas_extractor']，只有fork方式启动的子进程会继承；spawn方式（Windows、macOS）的
+    解析进程池需要把本函数作为initializer，在子进程中同样注册后才能反序列化其中的函数
+    Returns:
+        module: 提取脚本模块
+    """
+    if 'rsas_extractor' in sys.modules:
+        return sys.modules['rsas_extractor']
+    script = next(Path(__file__).resolve().parent.glob('RSAS_V6*.py'))
+    spec = spec_from_file_location('rsas_extractor', script)
+    module = module_from_spec(spec)
+    sys.modules[spec.name] = module
+    spec.loader.exec_module(module)
+    return module
+
+
+def percentile(values, pct):
+    """
+    返回已排序列表的近似百分位数
+    """
+    return values[min(len(values) - 1, int(len(values) * pct / 100))]
+
+
+def peakRss():
+    """
+    返回当前进程（含已结束子进程中最大者）的峰值内存，单位MB，无法获取时返回None
+    """
+    try:
+        from resource import getrusage, RUSAGE_SELF, RUSAGE_CHILDREN
+    except ImportError:
+        try:
+            import psutil
+        except ImportError:
+            return None
+        return psutil.Process().memory_info().peak_wset / (1 << 20)
+    # Linux上ru_maxrss单位为KB，macOS上为字节
+    scale = 1 << 20 if sys.platform == 'darwin' else 1 << 10
+    return max(getrusage(RUSAGE_SELF).ru_maxrss, getrusage(RUSAGE_CHILDREN).ru_maxrss) / scale
+
+
+# synthetic RSAS export
+def hostWorkbook(xlwt, rng, ip, ports=8, range_ratio=0.05, range_size=1000, hostname=True, system_type=True,
+                 vulns=5):
+    """
+    生成单个主机的xls报表，布局与RSAS V6主机报表一致：
+    “主机概况”第2行为IP，第4/5行为主机名、操作系统等字段，第8行为扫描起止时间；
+    “其它信息”中包含“远程端口信息”块（协议、端口、应用层协议、服务、状态），其后还有其它信息块
+    Args:
+        xlwt: xlwt模块
+        rng: 随机数生成器
+        ip: 主机IP
+        ports: 端口行数
+        range_ratio: 端口行为端口范围（如1-1000）的比例
+        range_size: 端口范围的最大跨度
+        hostname: 是否包含主机名列
+        system_type: 是否包含操作系统列
+        vulns: 漏洞信息行数
+    Returns:
+        bytes: xls文件内容
+    """
+    book = xlwt.Workbook(encoding='utf-8')
+    host = book.add_sheet('主机概况')
+    host.write(0, 0, '主机概况')
+    host.write(2, 0, 'IP地址')
+    host.write(2, 1, ip)
+    fields = [('主机名', f'host-{ip.replace(".", "-")}') if hostname else ('MAC地址', '00:0c:29:00:00:01'),
+              ('操作系统', rng.choice(SYSTEM_TYPES)) if system_type else ('设备类型', '服务器'),
+              ('风险等级', rng.choice(['高', '中', '低'])),
+              ('风险值', round(rng.uniform(0, 10), 1))]
+    order = list(range(len(fields)))
+    rng.shuffle(order)
+    for column, index in enumerate(order, 1):
+        host.write(4, column, fields[index][0])
+        host.write(5, column, fields[index][1])
+    day = rng.randint(1, 28)
+    host.write(7, 1, '开始时间')
+    host.write(7, 2, '结束时间')
+    host.write(8, 0, '扫描时间')
+    host.write(8, 1, f'2025-01-{day:02d} 09:00:00')
+    host.write(8, 2, f'2025-01-{day:02d} {rng.randint(10, 18)}:{rng.randint(0, 59):02d}:00')
+    host.write(10, 0, '漏洞数量')
+    host.write(10, 1, vulns)
+
+    vuln = book.add_sheet('漏洞信息')
+    for column, title in enumerate(['漏洞名称', '风险等级', '端口', '详细描述', '解决办法']):
+        vuln.write(0, column, title)
+    for row in range(1, vulns + 1):
+        vuln.write(row, 0, f'模拟漏洞-{rng.randint(1, 5000)}')
+        vuln.write(row, 1, rng.choice(['高', '中', '低']))
+        vuln.write(row, 2, rng.choice(COMMON_PORTS)[0])
+        vuln.write(row, 3, '该漏洞的详细描述。' * rng.randint(5, 30))
+        vuln.write(row, 4, '升级到最新版本或按厂商公告进行加固。' * rng.randint(1, 5))
+
+    other = book.add_sheet('其它信息')
+    row = 0
+    other.write(row, 0, '操作系统信息')
+    other.write(row + 1, 0, '操作系统')
+    other.write(row + 1, 1, rng.choice(SYSTEM_TYPES))
+    row += 3
+    other.write(row, 0, '远程端口信息')
+    for column, title in enumerate(['协议', '端口', '应用层协议', '服务', '状态']):
+        other.write(row + 1, column, title)
+    row += 2
+    for _ in range(ports):
+        port, protocol, service = rng.choice(COMMON_PORTS)
+        transport = 'udp' if port == 53 else 'tcp'
+        if rng.random() < range_ratio:
+            start = rng.randint(1, 65535 - range_size)
+            other.write(row, 1, f'{start}-{start + rng.randint(1, range_size)}')
+            protocol, service, status = 'unknown', '', 'filtered'
+        else:
+            other.write(row, 1, port if rng.random() < 0.7 else rng.randint(1024, 65535))
+            status = 'open'
+        other.write(row, 0, transport)
+        other.write(row, 2, protocol)
+        other.write(row, 3, service)
+        other.write(row, 4, status)
+        row += 1
+    row += 1
+    other.write(row, 0, '服务信息')
+    other.write(row + 1, 0, '服务')
+    other.write(row + 1, 1, 'web')
+
+    buffer = BytesIO()
+    book.save(buffer)
+    return buffer.getvalue()
+
+
+def generateExport(out_dir, hosts=1000, ports=8, range_ratio=0.05, range_size=1000, no_port_ratio=0.05,
+                   missing_hostname=0.1, missing_os=0.1, vulns=5, taskid=1, name='模拟任务', seed=1):
+    """
+    生成一个模拟的RSAS V6导出包（任务序号_任务名称_导出时间_xls.zip）
+    Args:
+        out_dir: 输出目录
+        hosts: 主机数
+        ports: 每台主机的平均端口行数
+        range_ratio: 端口行为端口范围的比例
+        range_size: 端口范围的最大跨度
+        no_port_ratio: 没有开放端口的主机比例
+        missing_hostname: 缺少主机名列的主机比例
+        missing_os: 缺少操作系统列的主机比例
+        vulns: 每台主机的漏洞信息行数
+        taskid: 任务序号
+        name: 任务名称
+        seed: 随机种子，相同参数和种子生成相同的文件
+    Returns:
+        Path: 生成的ZIP文件路径
+    """
+    try:
+        import xlwt
+    except ImportError:
+        raise SystemExit('生成模拟数据需要先安装xlwt：pip install xlwt')
+    rng = Random(seed)
+    Path(out_dir).mkdir(parents=True, exist_ok=True)
+    output = Path(out_dir) / f'{taskid}_{name}_2025_01_21_xls.zip'
+    with ZipFile(output, 'w', ZIP_DEFLATED) as archive:
+        # 综述报表，提取时会被忽略
+        archive.writestr('index.xls', b'')
+        for index in range(hosts):
+            ip = f'10.{(index >> 16) & 255}.{(index >> 8) & 255}.{index & 255}'
+            count = 0 if rng.random() < no_port_ratio else max(1, int(rng.expovariate(1 / ports)))
+            archive.writestr(f'{ip}.xls', hostWorkbook(
+                xlwt, rng, ip, ports=count, range_ratio=range_ratio, range_size=range_size,
+                hostname=rng.random() >= missing_hostname, system_type=rng.random() >= missing_os, vulns=vulns))
+    return output
+
+
+# benchmarks
+def benchParse(zip_file, limit=0):
+    """
+    逐个主机比较快速解析与xlrd完整解析的耗时，并校验两者结果一致
+    Args:
+        zip_file: RSAS导出的ZIP文件
+        limit: 最多测试的主机数，0为全部
+    """
+    rsas = loadExtractor()
+    members = rsas.listHostMembers(str(zip_file))
+    if limit:
+        members = members[:limit]
+    fast_times, full_times = [], []
+    fallbacks = mismatches = 0
+    with open(zip_file, 'rb') as fp:
+        for member in members:
+            contents = rsas.readMemberBytes(fp, str(zip_file), member)
+
+            start = perf_counter()
+            try:
+                fast = rsas.readPortXlsFast(contents)
+            except rsas.FastParseError:
+                fast = None
+                fallbacks += 1
+            fast_times.append(perf_counter() - start)
+
+            start = perf_counter()
+            full = rsas.readPortXlsData(data=rsas.open_workbook(file_contents=contents))
+            full_times.append(perf_counter() - start)
+
+            if fast is not None and fast != full:
+                mismatches += 1
+                print(f'[-] 主机[{member[0]}]快速解析结果与xlrd不一致')
+
+    if not members:
+        print('[-] 没有找到主机报表')
+        return
+    print(f'主机数: {len(members)}  回退: {fallbacks}  结果不一致: {mismatches}')
+    print(f'{"解析方式":<12}{"平均(ms)":>10}{"中位数(ms)":>12}{"P95(ms)":>10}{"总计(s)":>10}')
+    for label, times in (('快速解析', fast_times), ('xlrd完整解析', full_times)):
+        ordered = sorted(times)
+        print(f'{label:<12}{mean(times) * 1000:>10.2f}{median(times) * 1000:>12.2f}'
+              f'{percentile(ordered, 95) * 1000:>10.2f}{sum(times):>10.2f}')
+    print(f'加速比: {sum(full_times) / sum(fast_times):.2f}x')
+
+
+def measureStages(zip_file, workers=1, fmt='xlsx'):
+    """
+    在当前进程中依次测量各阶段的耗时，由benchScales()在独立子进程中调用，保证峰值内存互不影响
+    Args:
+        zip_file: RSAS导出的ZIP文件
+        workers: readZipData的并行进程数
+        fmt: save的输出格式
+    Returns:
+        dict: 各阶段的主机数、行数、耗时
+    """
+    rsas = loadExtractor()
+    zip_file = Path(zip_file)
+    members = rsas.listHostMembers(str(zip_file))
+    stages = {}
+
+    # readPortXlsData：xlrd完整解析；parseHostXls：默认的快速解析
+    with open(zip_file, 'rb') as fp:
+        contents = [rsas.readMemberBytes(fp, str(zip_file), member) for member in members]
+    start = perf_counter()
+    for data in contents:
+        rsas.readPortXlsData(data=rsas.open_workbook(file_contents=data))
+    stages['readPortXlsData'] = {'hosts': len(contents), 'seconds': perf_counter() - start}
+    start = perf_counter()
+    for data in contents:
+        rsas.parseHostXls(data)
+    stages['parseHostXls'] = {'hosts': len(contents), 'seconds': perf_counter() - start}
+    del contents
+
+    # 进程池的启动时间计入readZipData，与readZipData自行创建进程池时一致
+    start = perf_counter()
+    pool = ProcessPoolExecutor(workers, initializer=loadExtractor) if workers > 1 else None
+    try:
+        records = rsas.readZipData(zip_file.parent, zip_file.name, workers=workers, pool=pool)
+    finally:
+        if pool is not None:
+            pool.shutdown()
+    stages['readZipData'] = {'hosts': len(records), 'seconds': perf_counter() - start}
+
+    rows = sum(1 for record in records for _ in record.rows(0))
+    with TemporaryDirectory() as out_dir:
+        output_name = zip_file.name
+        start = perf_counter()
+        rsas.save(out_dir, output_name, records, reporter=QuietReporter(), fmt=fmt)
+        stages['save'] = {'hosts': len(records), 'rows': rows, 'seconds': perf_counter() - start}
+    return {'stages': stages, 'peak_rss_mb': peakRss()}
+
+
+class QuietReporter:
+    """
+    不输出进度的save()进度接收器
+    """
+    def advance(self, hosts=1):
+        pass
+
+    def log(self, message):
+        pass
+
+
+def benchScales(scales, data_dir, workers=1, fmt='xlsx', ports=8, range_ratio=0.05):
+    """
+    按多个规模生成模拟数据并测量各阶段吞吐量
+    Args:
+        scales: 主机数列表
+        data_dir: 模拟数据目录，已生成的相同参数的数据会直接复用
+        workers: readZipData的并行进程数
+        fmt: save的输出格式
+        ports: 每台主机的平均端口行数
+        range_ratio: 端口行为端口范围的比例
+    Returns:
+        dict: {规模: 测量结果}
+    """
+    results = {}
+    for hosts in scales:
+        scale_dir = Path(data_dir) / f'h{hosts}_p{ports}_r{range_ratio}'
+        archives = list(scale_dir.glob('*_xls.zip'))
+        if archives:
+            archive = archives[0]
+        else:
+            print(f'[*] 正在生成 {hosts} 台主机的模拟数据……')
+            archive = generateExport(scale_dir, hosts=hosts, ports=ports, range_ratio=range_ratio)
+        # 每个规模在独立进程中测量，峰值内存才能反映该规模本身
+        completed = run([sys.executable, str(Path(__file__).resolve()), 'measure', str(archive),
+                         '--workers', str(workers), '--format', fmt], capture_output=True, text=True)
+        if completed.returncode != 0:
+            raise SystemExit(completed.stderr)
+        results[str(hosts)] = json.loads(completed.stdout.splitlines()[-1])
+        printScale(hosts, results[str(hosts)])
+    return results
+
+
+def printScale(hosts, result):
+    """
+    输出单个规模的测量结果
+    """
+    rss = result['peak_rss_mb']
+    print(f'规模 {hosts} 台主机  峰值内存 {"未知" if rss is None else f"{rss:.1f} MB"}')
+    print(f'  {"阶段":<18}{"耗时(s)":>10}{"主机/秒":>12}{"行/秒":>12}')
+    for stage, values in result['stages'].items():
+        seconds = max(values['seconds'], 1e-9)
+        rows = f'{values["rows"] / seconds:>12.0f}' if 'rows' in values else f'{"-":>12}'
+        print(f'  {stage:<18}{values["seconds"]:>10.3f}{values["hosts"] / seconds:>12.0f}{rows}')
+
+
+def compareBaseline(results, baseline_file, tolerance=0.2):
+    """
+    与基线结果比较各阶段的主机吞吐量，变慢超过tolerance时视为性能回退
+    Returns:
+        list: 回退项描述
+    """
+    baseline = json.loads(Path(baseline_file).read_text(encoding='utf-8'))
+    regressions = []
+    for hosts, result in results.items():
+        for stage, values in result['stages'].items():
+            old = baseline.get(hosts, {}).get('stages', {}).get(stage)
+            if not old:
+                continue
+            old_rate = old['hosts'] / max(old['seconds'], 1e-9)
+            new_rate = values['hosts'] / max(values['seconds'], 1e-9)
+            if new_rate < old_rate * (1 - tolerance):
+                regressions.append(f'规模 {hosts} 阶段 {stage}: {old_rate:.0f} -> {new_rate:.0f} 主机/秒')
+    return regressions
+
+
+def main(argv=None):
+    parser = ArgumentParser(description='RSAS端口扫描报告提取工具性能测试')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    gen = commands.add_parser('gen', help='生成模拟的RSAS V6导出包（需要xlwt）')
+    gen.add_argument('--out', type=Path, default=Path('bench_data'), help='输出目录（默认bench_data）')
+    gen.add_argument('--hosts', type=int, default=1000, help='主机数（默认1000）')
+    gen.add_argument('--ports', type=int, default=8, help='每台主机的平均端口行数（默认8）')
+    gen.add_argument('--range-ratio', type=float, default=0.05, help='端口行为端口范围的比例（默认0.05）')
+    gen.add_argument('--range-size', type=int, default=1000, help='端口范围的最大跨度（默认1000）')
+    gen.add_argument('--no-port-ratio', type=float, default=0.05, help='没有开放端口的主机比例（默认0.05）')
+    gen.add_argument('--missing-hostname', type=float, default=0.1, help='缺少主机名列的主机比例（默认0.1）')
+    gen.add_argument('--missing-os', type=float, default=0.1, help='缺少操作系统列的主机比例（默认0.1）')
+    gen.add_argument('--vulns', type=int, default=5, help='每台主机的漏洞信息行数（默认5）')
+    gen.add_argument('--taskid', type=int, default=1, help='任务序号（默认1）')
+    gen.add_argument('--seed', type=int, default=1, help='随机种子（默认1）')
+
+    bench = commands.add_parser('run', help='按多个规模测试readPortXlsData、readZipData、save的吞吐量和峰值内存')
+    bench.add_argument('--scales', default='100,1000,5000', help='主机数列表，逗号分隔（默认100,1000,5000）')
+    bench.add_argument('--data-dir', type=Path, default=Path('bench_data'), help='模拟数据目录（默认bench_data）')
+    bench.add_argument('--workers', type=int, default=1, help='readZipData的并行进程数（默认1）')
+    bench.add_argument('--format', default='xlsx', help='save的输出格式（默认xlsx）')
+    bench.add_argument('--ports', type=int, default=8, help='每台主机的平均端口行数（默认8）')
+    bench.add_argument('--range-ratio', type=float, default=0.05, help='端口行为端口范围的比例（默认0.05）')
+    bench.add_argument('--save', type=Path, help='把结果保存为JSON，可作为以后的基线')
+    bench.add_argument('--compare', type=Path, help='与基线JSON比较，吞吐量下降超过--tolerance时返回非0')
+    bench.add_argument('--tolerance', type=float, default=0.2, help='允许的吞吐量下降比例（默认0.2）')
+
+    measure = commands.add_parser('measure', help='（内部使用）在当前进程中测量单个ZIP各阶段的耗时')
+    measure.add_argument('zip', type=Path)
+    measure.add_argument('--workers', type=int, default=1)
+    measure.add_argument('--format', default='xlsx')
+
+    parse = commands.add_parser('parse', help='比较快速解析与xlrd完整解析的单主机耗时')
+    parse.add_argument('zip', type=Path, help='RSAS导出的ZIP文件')
+    parse.add_argument('--limit', type=int, default=0, help='最多测试的主机数，0为全部')
+
+    args = parser.parse_args(argv)
+    if args.command == 'gen':
+        output = generateExport(args.out, hosts=args.hosts, ports=args.ports, range_ratio=args.range_ratio,
+                                range_size=args.range_size, no_port_ratio=args.no_port_ratio,
+                                missing_hostname=args.missing_hostname, missing_os=args.missing_os,
+                                vulns=args.vulns, taskid=args.taskid, seed=args.seed)
+        print(f'[+] 已生成 {output}')
+    elif args.command == 'run':
+        scales = [int(scale) for scale in args.scales.split(',') if scale]
+        results = benchScales(scales, args.data_dir, workers=args.workers, fmt=args.format, ports=args.ports,
+                              range_ratio=args.range_ratio)
+        if args.save:
+            args.save.write_text(json.dumps(results, ensure_ascii=False, indent=2), encoding='utf-8')
+            print(f'[+] 结果已保存到 {args.save}')
+        if args.compare:
+            regressions = compareBaseline(results, args.compare, args.tolerance)
+            for regression in regressions:
+                print(f'[-] 性能回退 {regression}')
+            if regressions:
+                raise SystemExit(1)
+            print('[+] 未发现性能回退')
+    elif args.command == 'measure':
+        print(json.dumps(measureStages(args.zip, workers=args.workers, fmt=args.format)))
+    elif args.command == 'parse':
+        benchParse(args.zip, args.limit)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,339 @@
+# coding=utf-8
+"""
+RSAS端口扫描结果的历史库（SQLite）
+
+提取脚本使用 --store 参数时，每个任务保存的行会同时批量写入历史库，之后可跨任务按IP、端口、服务、扫描时间查询：
+    python rsas_store.py scans.db query --port 3389 --days 180 --hosts    近半年开放过3389端口的主机
+    python rsas_store.py scans.db query --ip 10.0.* --service mysql       某网段的MySQL端口
+    python rsas_store.py scans.db tasks                                   已入库的任务
+    python rsas_store.py scans.db import pending/1_扫描任务_2024_01_25_xls.xlsx   导入以前生成的结果
+也可以在Python中使用：
+    from rsas_store import ScanStore
+    with ScanStore('scans.db') as store:
+        rows = store.query(port=3389, since='2025-01-01')
+"""
+import csv
+import json
+from argparse import ArgumentParser
+from datetime import datetime, timedelta
+from pathlib import Path
+from sqlite3 import connect
+from sys import stdout
+from threading import Lock
+from time import strftime, localtime
+
+# 历史库保存的字段，与提取结果的前9列相同（ip:port可由ip和port得到，不单独保存）
+STORE_COLUMNS = ['taskid', 'ip', 'hostname', 'system_type', 'scan_time', 'port', 'protocol', 'service', 'status']
+
+
+class ScanStore:
+    """
+    跨任务的端口扫描历史库，可在多个线程中共用
+    每个任务（按输出文件名区分）重新导入时先删除旧数据；ip、port、service、scan_time均建有索引
+    """
+    VERSION = '1'  # 表结构变化时递增
+    batch_size = 5000
+
+    def __init__(self, store_path):
+        Path(store_path).parent.mkdir(parents=True, exist_ok=True)
+        self.lock = Lock()
+        self.conn = connect(str(store_path), check_same_thread=False)
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        self.conn.execute('PRAGMA synchronous=NORMAL')
+        self.conn.executescript('''
+            CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT);
+            CREATE TABLE IF NOT EXISTS tasks (id INTEGER PRIMARY KEY, archive TEXT UNIQUE, taskid INTEGER,
+                                              imported TEXT, rows INTEGER);
+            CREATE TABLE IF NOT EXISTS ports (task INTEGER, taskid INTEGER, ip TEXT, hostname TEXT,
+                                              system_type TEXT, scan_time TEXT, port, protocol TEXT,
+                                              service TEXT, status TEXT);
+            CREATE INDEX IF NOT EXISTS ports_ip ON ports (ip, port);
+            CREATE INDEX IF NOT EXISTS ports_port ON ports (port, scan_time);
+            CREATE INDEX IF NOT EXISTS ports_service ON ports (service, scan_time);
+            CREATE INDEX IF NOT EXISTS ports_scan_time ON ports (scan_time);
+            CREATE INDEX IF NOT EXISTS ports_task ON ports (task);
+        ''')
+        row = self.conn.execute("SELECT value FROM meta WHERE key = 'version'").fetchone()
+        if row is None:
+            self.conn.execute("INSERT INTO meta VALUES ('version', ?)", (self.VERSION,))
+            self.conn.commit()
+        elif row[0] != self.VERSION:
+            raise ValueError(f'历史库[{store_path}]的版本为{row[0]}，当前程序需要版本{self.VERSION}')
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def openImport(self, archive, taskid):
+        """
+        开始导入一个任务，删除该任务以前导入的数据
+        Args:
+            archive: 任务名（输出文件名，不含扩展名）
+            taskid: 任务ID
+        Returns:
+            StoreImport: 与提取脚本的输出类相同的write()/close()接口
+        """
+        with self.lock:
+            self._remove(archive)
+            cursor = self.conn.execute('INSERT INTO tasks (archive, taskid, imported, rows) VALUES (?, ?, ?, 0)',
+                                       (archive, taskid, strftime('%Y-%m-%d %H:%M:%S', localtime())))
+            self.conn.commit()
+        return StoreImport(self, cursor.lastrowid)
+
+    def _insert(self, task, rows):
+        with self.lock:
+            self.conn.executemany(f'INSERT INTO ports VALUES (?, {", ".join("?" * len(STORE_COLUMNS))})',
+                                  ([task] + row for row in rows))
+
+    def _finish(self, task, count):
+        with self.lock:
+            self.conn.execute('UPDATE tasks SET rows = ? WHERE id = ?', (count, task))
+            self.conn.commit()
+
+    def _remove(self, archive):
+        row = self.conn.execute('SELECT id FROM tasks WHERE archive = ?', (archive,)).fetchone()
+        if row is not None:
+            self.conn.execute('DELETE FROM ports WHERE task = ?', row)
+            self.conn.execute('DELETE FROM tasks WHERE id = ?', row)
+        return row is not None
+
+    def remove(self, archive):
+        """
+        删除一个任务的数据
+        Returns:
+            bool: 该任务是否存在
+        """
+        with self.lock:
+            removed = self._remove(archive)
+            self.conn.commit()
+        return removed
+
+    def hasArchive(self, archive):
+        """
+        任务是否已完整导入
+        """
+        with self.lock:
+            row = self.conn.execute('SELECT rows FROM tasks WHERE archive = ?', (archive,)).fetchone()
+        return row is not None and row[0] > 0
+
+    def tasks(self):
+        """
+        Returns:
+            list: 已导入任务的(任务名, 任务ID, 导入时间, 行数)列表，按导入时间排序
+        """
+        with self.lock:
+            return self.conn.execute('SELECT archive, taskid, imported, rows FROM tasks ORDER BY imported').fetchall()
+
+    def query(self, ip=None, port=None, service=None, status=None, taskid=None, since=None, until=None,
+              hosts=False, limit=0):
+        """
+        按条件查询端口记录，条件之间为“且”
+        Args:
+            ip: IP地址，含*或?时按通配符匹配（如10.0.*）
+            port: 端口号
+            service: 服务名称，含*或?时按通配符匹配
+            status: 端口状态（如open）
+            taskid: 任务ID
+            since: 扫描时间下限（含），格式与scan_time相同，可只写日期
+            until: 扫描时间上限（不含）
+            hosts: 为True时只返回不重复的(ip, hostname, system_type, 最后扫描时间)
+            limit: 最多返回的行数，0为不限
+        Returns:
+            list: STORE_COLUMNS顺序的行；hosts为True时为主机列表
+        """
+        conditions, params = [], []
+        for column, value in (('ip', ip), ('service', service)):
+            if value is None:
+                continue
+            # GLOB区分大小写，前缀匹配时可以使用索引
+            conditions.append(f'{column} GLOB ?' if any(ch in value for ch in '*?[') else f'{column} = ?')
+            params.append(value)
+        for column, value in (('port', port), ('status', status), ('taskid', taskid)):
+            if value is not None:
+                conditions.append(f'{column} = ?')
+                params.append(value)
+        if since:
+            conditions.append('scan_time >= ?')
+            params.append(since)
+        if until:
+            conditions.append('scan_time < ?')
+            params.append(until)
+        where = f' WHERE {" AND ".join(conditions)}' if conditions else ''
+        if hosts:
+            sql = (f'SELECT ip, hostname, system_type, MAX(scan_time) FROM ports{where} '
+                   f'GROUP BY ip ORDER BY ip')
+        else:
+            sql = f'SELECT {", ".join(STORE_COLUMNS)} FROM ports{where} ORDER BY scan_time, ip'
+        if limit:
+            sql += f' LIMIT {int(limit)}'
+        with self.lock:
+            return self.conn.execute(sql, params).fetchall()
+
+    def close(self):
+        """
+        关闭数据库连接
+        """
+        with self.lock:
+            self.conn.commit()
+            self.conn.close()
+
+
+class StoreImport:
+    """
+    单个任务的导入过程，按批次批量插入；没有端口的主机，端口相关字段保存为NULL
+    """
+    def __init__(self, store, task):
+        self.store = store
+        self.task = task
+        self.rows = []
+        self.count = 0
+
+    def write(self, row):
+        row = list(row[:len(STORE_COLUMNS)])
+        if row[5] == 'null':
+            row[5:] = [None] * 4
+        self.rows.append(row)
+        if len(self.rows) >= self.store.batch_size:
+            self.flush()
+
+    def flush(self):
+        self.store._insert(self.task, self.rows)
+        self.count += len(self.rows)
+        self.rows = []
+
+    def close(self):
+        self.flush()
+        self.store._finish(self.task, self.count)
+
+
+def readOutputRows(file_path):
+    """
+    逐行读取提取脚本生成的结果（xlsx、csv、jsonl、sqlite、parquet，按扩展名区分），跳过表头
+    xlsx包含所有续写的工作表；文本格式中的任务ID和端口号还原为整数，与xlsx一致；
+    xlsx中的空单元格读出为None，第2-8列的None还原为空字符串，与其它格式一致
+    Yields:
+        list: 与提取结果表头顺序相同的一行
+    """
+    for row in iterOutputRows(Path(file_path)):
+        row = list(row)
+        for index in (0, 5):
+            if isinstance(row[index], str) and row[index].isdigit():
+                row[index] = int(row[index])
+        for index in range(2, 9):
+            if index < len(row) and row[index] is None:
+                row[index] = ''
+        yield row
+
+
+def iterOutputRows(file_path):
+    suffix = file_path.suffix.lower()
+    if suffix == '.csv':
+        with open(file_path, newline='', encoding='utf-8-sig') as fp:
+            reader = csv.reader(fp)
+            next(reader, None)
+            yield from reader
+    elif suffix == '.jsonl':
+        with open(file_path, encoding='utf-8') as fp:
+            for line in fp:
+                if line.strip():
+                    yield list(json.loads(line).values())
+    elif suffix == '.db':
+        conn = connect(str(file_path))
+        try:
+            yield from conn.execute('SELECT * FROM ports')
+        finally:
+            conn.close()
+    elif suffix == '.parquet':
+        import pyarrow.parquet as pq
+        for batch in pq.ParquetFile(str(file_path)).iter_batches():
+            yield from zip(*(column.to_pylist() for column in batch.columns))
+    else:
+        from openpyxl import load_workbook
+        book = load_workbook(file_path, read_only=True)
+        try:
+            for sheet in book.worksheets:
+                rows = sheet.iter_rows(values_only=True)
+                next(rows, None)
+                yield from rows
+        finally:
+            book.close()
+
+
+def importOutput(store, file_path):
+    """
+    把已生成的结果文件导入历史库，任务名为文件名（不含扩展名）
+    Returns:
+        int: 导入的行数
+    """
+    loader = None
+    for row in readOutputRows(file_path):
+        if loader is None:
+            loader = store.openImport(Path(file_path).stem, row[0])
+        loader.write(row)
+    if loader is None:
+        return 0
+    loader.close()
+    return loader.count
+
+
+def main(argv=None):
+    parser = ArgumentParser(description='RSAS端口扫描结果历史库')
+    parser.add_argument('store', type=Path, help='历史库文件（SQLite）')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    query = commands.add_parser('query', help='按IP、端口、服务、扫描时间查询')
+    query.add_argument('--ip', help='IP地址，可用通配符（如10.0.*）')
+    query.add_argument('--port', type=int, help='端口号')
+    query.add_argument('--service', help='服务名称，可用通配符')
+    query.add_argument('--status', help='端口状态（如open）')
+    query.add_argument('--taskid', type=int, help='任务ID')
+    query.add_argument('--since', help='扫描时间下限，如2025-01-01')
+    query.add_argument('--until', help='扫描时间上限（不含）')
+    query.add_argument('--days', type=int, help='只查询最近N天的扫描，等同于--since')
+    query.add_argument('--hosts', action='store_true', help='只输出不重复的主机')
+    query.add_argument('--limit', type=int, default=0, help='最多输出的行数，0为不限（默认0）')
+    query.add_argument('--csv', type=Path, help='结果写入csv文件，默认输出到控制台')
+
+    commands.add_parser('tasks', help='列出已导入的任务')
+
+    imports = commands.add_parser('import', help='导入以前生成的结果（xlsx、csv、jsonl、sqlite、parquet）')
+    imports.add_argument('files', nargs='+', type=Path)
+
+    remove = commands.add_parser('remove', help='删除任务的数据')
+    remove.add_argument('archives', nargs='+', help='任务名（输出文件名，不含扩展名）')
+
+    args = parser.parse_args(argv)
+    with ScanStore(args.store) as store:
+        if args.command == 'query':
+            since = args.since
+            if args.days is not None:
+                since = (datetime.now() - timedelta(days=args.days)).strftime('%Y-%m-%d %H:%M:%S')
+            rows = store.query(ip=args.ip, port=args.port, service=args.service, status=args.status,
+                               taskid=args.taskid, since=since, until=args.until, hosts=args.hosts,
+                               limit=args.limit)
+            header = ['ip', 'hostname', 'system_type', 'scan_time'] if args.hosts else STORE_COLUMNS
+            if args.csv:
+                with open(args.csv, 'w', newline='', encoding='utf-8-sig') as fp:
+                    writer = csv.writer(fp)
+                    writer.writerow(header)
+                    writer.writerows(rows)
+                print(f'共 {len(rows)} 行，已写入 {args.csv}')
+            else:
+                writer = csv.writer(stdout, delimiter='\t', lineterminator='\n')
+                writer.writerow(header)
+                writer.writerows(rows)
+        elif args.command == 'tasks':
+            for archive, taskid, imported, rows in store.tasks():
+                print(f'{taskid}\t{archive}\t{imported}\t{rows} 行')
+        elif args.command == 'import':
+            for file_path in args.files:
+                print(f'{file_path}: 导入 {importOutput(store, file_path)} 行')
+        elif args.command == 'remove':
+            for archive in args.archives:
+                print(f'{archive}: {"已删除" if store.remove(archive) else "不存在"}')
+
+
+if __name__ == "__main__":
+    main()